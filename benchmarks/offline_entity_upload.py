@@ -0,0 +1,70 @@
+"""
+Measures how fast get_historical_features uploads a pandas entity DataFrame to Teradata, comparing
+the previous pandas to_sql upload with the batched executemany and FastLoad uploads of
+df_to_teradata_table. Every method uploads the same frame to a fresh table, checks the row count
+and drops the table again. It needs the offline store of a feature repository to connect to.
+
+    python benchmarks/offline_entity_upload.py --repo-path test_repo/feature_repo
+    python benchmarks/offline_entity_upload.py --repo-path test_repo/feature_repo --rows 1000000 5000000 --methods executemany fastload
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from feast.infra.offline_stores import offline_utils
+from feast.repo_config import load_repo_config
+
+from feast_teradata.offline.teradata_source import df_to_teradata_table
+from feast_teradata.teradata_utils import get_conn, pooled_connection
+
+
+def make_entity_df(n_rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    end = pd.Timestamp.utcnow().floor("s")
+    return pd.DataFrame({
+        "driver_id": rng.integers(1001, 1001 + 100_000, n_rows),
+        "customer_id": [f"C{i:08d}" for i in rng.integers(0, 10_000_000, n_rows)],
+        "event_timestamp": end - pd.to_timedelta(rng.integers(0, 30 * 86400, n_rows), unit="s"),
+    })
+
+
+def upload(method: str, offline_config, df: pd.DataFrame, table_name: str, batch_size: int):
+    if method == "to_sql":
+        with get_conn(offline_config).connect() as conn:
+            df.to_sql(name=table_name, con=conn, if_exists="replace", index=False)
+    elif method == "executemany":
+        df_to_teradata_table(offline_config, df, table_name, batch_size=batch_size)
+    else:
+        df_to_teradata_table(offline_config, df, table_name, batch_size=batch_size, fastload_min_rows=0)
+
+
+def run_benchmark(args):
+    offline_config = load_repo_config(args.repo_path, args.repo_path / "feature_store.yaml").offline_store
+    print(f"{'method':>12} {'rows':>10} {'seconds':>9} {'rows/s':>10}")
+    for n_rows in args.rows:
+        df = make_entity_df(n_rows)
+        for method in args.methods:
+            table_name = offline_utils.get_temp_entity_table_name()
+            start = time.perf_counter()
+            try:
+                upload(method, offline_config, df, table_name, args.batch_size)
+                elapsed = time.perf_counter() - start
+                with pooled_connection(offline_config) as conn, conn.cursor() as cur:
+                    cur.execute(f"SELECT COUNT(*) FROM {table_name}")
+                    assert cur.fetchone()[0] == n_rows, "every entity row must be uploaded"
+            finally:
+                with pooled_connection(offline_config) as conn, conn.cursor() as cur:
+                    cur.execute(f"DROP TABLE {table_name}")
+            print(f"{method:>12} {n_rows:>10,} {elapsed:>9.1f} {n_rows / elapsed:>10,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repo-path", type=Path, required=True, help="Feature repository of the offline store")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--methods", nargs="+", choices=["to_sql", "executemany", "fastload"],
+                        default=["to_sql", "executemany", "fastload"])
+    parser.add_argument("--batch-size", type=int, default=10_000, help="Rows per executemany call")
+    run_benchmark(parser.parse_args())
@@ -0,0 +1,109 @@
+"""
+Measures how long online_read takes to turn the fetched rows into feast results, after the
+query has returned. The "before" numbers come from the per-entity scan (a boolean filter and
+iterrows over the whole result for every entity key) that online_read used to run; the "after"
+numbers come from grouping the fetched row tuples once by serialized entity key.
+
+    python benchmarks/online_read_assembly.py --entities 1000 10000 50000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+from feast.infra.key_encoding_utils import serialize_entity_key
+from feast.protos.feast.types.EntityKey_pb2 import EntityKey as EntityKeyProto
+from feast.protos.feast.types.Value_pb2 import Value as ValueProto
+
+from feast_teradata.online.teradata import _group_narrow_rows
+
+ENTITY_KEY_SERIALIZATION_VERSION = 2
+
+
+def make_result(n_entities: int, n_features: int):
+    entity_keys = [
+        EntityKeyProto(join_keys=["driver_id"], entity_values=[ValueProto(int64_val=i)])
+        for i in range(n_entities)
+    ]
+    now = datetime.utcnow()
+    rows = []
+    for i, entity_key in enumerate(entity_keys):
+        entity_key_bin = serialize_entity_key(
+            entity_key, entity_key_serialization_version=ENTITY_KEY_SERIALIZATION_VERSION
+        )
+        for j in range(n_features):
+            rows.append(
+                (
+                    entity_key_bin,
+                    f"feature_{j}",
+                    ValueProto(double_val=i * 0.5 + j).SerializeToString(),
+                    now - timedelta(seconds=i),
+                )
+            )
+    return entity_keys, rows
+
+
+def legacy_assembly(entity_keys, rows):
+    df = pd.DataFrame(rows, columns=["entity_key", "feature_name", "value", "event_ts"])
+    df["event_ts"] = pd.to_datetime(df["event_ts"])
+    result = []
+    for entity_key in entity_keys:
+        entity_key_bin = serialize_entity_key(
+            entity_key, entity_key_serialization_version=ENTITY_KEY_SERIALIZATION_VERSION
+        )
+        res = {}
+        res_ts = None
+        for index, row in df[df["entity_key"] == entity_key_bin].iterrows():
+            val = ValueProto()
+            val.ParseFromString(row["value"])
+            res[row["feature_name"]] = val
+            res_ts = row["event_ts"].to_pydatetime()
+
+        if not res:
+            result.append((None, None))
+        else:
+            result.append((res_ts, res))
+    return result
+
+
+def grouped_assembly(entity_keys, rows):
+    entity_key_bins = [
+        serialize_entity_key(
+            entity_key, entity_key_serialization_version=ENTITY_KEY_SERIALIZATION_VERSION
+        )
+        for entity_key in entity_keys
+    ]
+    rows_by_entity = _group_narrow_rows(rows)
+    return [rows_by_entity.get(entity_key_bin, (None, None)) for entity_key_bin in entity_key_bins]
+
+
+def timed(assembly, entity_keys, rows) -> float:
+    start = time.perf_counter()
+    assembly(entity_keys, rows)
+    return time.perf_counter() - start
+
+
+def run_benchmark(entity_counts, n_features: int, legacy_max: int):
+    print(f"{'entities':>10} {'rows':>10} {'before (s)':>12} {'after (s)':>12}")
+    for n_entities in entity_counts:
+        entity_keys, rows = make_result(n_entities, n_features)
+        after = timed(grouped_assembly, entity_keys, rows)
+        if n_entities <= legacy_max:
+            before = f"{timed(legacy_assembly, entity_keys, rows):12.3f}"
+        else:
+            before = f"{'skipped':>12}"
+        print(f"{n_entities:>10,} {len(rows):>10,} {before} {after:12.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entities", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--features", type=int, default=4)
+    parser.add_argument(
+        "--legacy-max",
+        type=int,
+        default=10_000,
+        help="Largest entity count to run the (quadratic) legacy assembly for",
+    )
+    args = parser.parse_args()
+    run_benchmark(args.entities, args.features, args.legacy_max)
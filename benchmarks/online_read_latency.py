@@ -0,0 +1,83 @@
+"""
+Compares the per-request latency of an online point lookup issued through teradataml
+(DataFrame.from_query(...).to_pandas(), which online_read used to run) with the same lookup on a
+plain teradatasql cursor (which online_read runs now). It needs a Teradata system with a
+materialized online table, e.g. the one created by the template's test_workflow.py:
+
+    python benchmarks/online_read_latency.py --repo-path test_repo/feature_repo \
+        --feature-view driver_hourly_stats --iterations 200
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+from feast.repo_config import load_repo_config
+from teradataml import DataFrame
+
+from feast_teradata.teradata_utils import get_teradataml_context, pooled_connection
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def sample_keys(online_config, table_name: str, n_keys: int):
+    with pooled_connection(online_config) as conn:
+        with conn.cursor() as cur:
+            cur.execute(f'SELECT TOP {n_keys} "entity_feature_key" FROM "{table_name}"')
+            return [row[0] for row in cur.fetchall()]
+
+
+def teradataml_lookup(online_config, table_name: str, keys):
+    literals = ",".join(f"TO_BYTES('{key.hex()}','base16')" for key in keys)
+    query = f"""
+        SELECT "entity_key", "feature_name", "value", "event_ts"
+        FROM "{table_name}"
+        WHERE "entity_feature_key" IN ({literals})
+    """
+    get_teradataml_context(online_config)
+    return DataFrame.from_query(query).to_pandas()
+
+
+def cursor_lookup(online_config, table_name: str, keys):
+    markers = ", ".join("?" for _ in keys)
+    query = f"""
+        SELECT "entity_key", "feature_name", "value", "event_ts"
+        FROM "{table_name}"
+        WHERE "entity_feature_key" IN ({markers})
+    """
+    with pooled_connection(online_config) as conn:
+        with conn.cursor() as cur:
+            cur.execute(query, keys)
+            return cur.fetchall()
+
+
+def run_benchmark(repo_path: Path, feature_view: str, n_keys: int, iterations: int):
+    config = load_repo_config(repo_path, repo_path / "feature_store.yaml")
+    table_name = f"{config.project}_{feature_view}"
+    keys = sample_keys(config.online_store, table_name, n_keys)
+
+    print(f"{'path':>12} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    for name, lookup in [("teradataml", teradataml_lookup), ("cursor", cursor_lookup)]:
+        lookup(config.online_store, table_name, keys)  # warm up connections and caches
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            lookup(config.online_store, table_name, keys)
+            samples.append((time.perf_counter() - start) * 1000)
+        print(
+            f"{name:>12} {statistics.mean(samples):10.2f} "
+            f"{percentile(samples, 50):10.2f} {percentile(samples, 95):10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repo-path", type=Path, default=Path("feature_repo"))
+    parser.add_argument("--feature-view", default="driver_hourly_stats")
+    parser.add_argument("--keys", type=int, default=10, help="Number of keys per lookup")
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+    run_benchmark(args.repo_path, args.feature_view, args.keys, args.iterations)
@@ -0,0 +1,153 @@
+"""
+Drives TeradataOnlineStore.online_write_batch and online_read end to end over synthetic feature
+views with varying entity counts, feature counts and value sizes, and reports write rows/s and read
+latency percentiles. By default it runs against the in-memory stand-in of standin_db.py, so it
+needs no Teradata system and can run in CI; --latency-ms adds a simulated network round trip.
+--backend teradata runs the same suite against the online store of a feature repository.
+
+    python benchmarks/online_store_suite.py
+    python benchmarks/online_store_suite.py --entities 10000 100000 --features 4 32 --value-bytes 8 512
+    python benchmarks/online_store_suite.py --latency-ms 1 --layout narrow wide
+    python benchmarks/online_store_suite.py --backend teradata --repo-path test_repo/feature_repo
+"""
+import argparse
+import itertools
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Usage telemetry would add network calls to every timed online store call
+os.environ.setdefault("FEAST_USAGE", "False")
+
+from feast import Entity, FeatureView, Field, FileSource, RepoConfig
+from feast.protos.feast.types.EntityKey_pb2 import EntityKey as EntityKeyProto
+from feast.protos.feast.types.Value_pb2 import Value as ValueProto
+from feast.repo_config import load_repo_config
+from feast.types import Bytes
+
+from feast_teradata.online.teradata import TeradataOnlineStore
+from standin_db import InMemoryTeradata
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def make_feature_view(n_features: int, value_bytes: int) -> FeatureView:
+    return FeatureView(
+        name=f"bench_{n_features}f_{value_bytes}b",
+        entities=[Entity(name="driver", join_keys=["driver_id"])],
+        schema=[Field(name=f"feature_{j}", dtype=Bytes) for j in range(n_features)],
+        source=FileSource(path="bench.parquet", timestamp_field="event_timestamp"),
+        ttl=timedelta(days=1),
+    )
+
+
+def make_entity_key(i: int) -> EntityKeyProto:
+    return EntityKeyProto(join_keys=["driver_id"], entity_values=[ValueProto(int64_val=i)])
+
+
+def make_data(n_entities: int, n_features: int, value_bytes: int):
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    data = []
+    for i in range(n_entities):
+        values = {
+            f"feature_{j}": ValueProto(bytes_val=rng.getrandbits(8 * value_bytes).to_bytes(value_bytes, "little"))
+            for j in range(n_features)
+        }
+        data.append((make_entity_key(i), values, now - timedelta(seconds=i), now))
+    return data
+
+
+def make_config(args) -> RepoConfig:
+    overrides = {"table_layout": args.layout_name, "write_method": args.write_method}
+    if args.backend == "teradata":
+        config = load_repo_config(args.repo_path, args.repo_path / "feature_store.yaml")
+        config.online_store = config.online_store.copy(update=overrides)
+        return config
+    return RepoConfig(
+        project="bench",
+        provider="local",
+        registry="registry.db",
+        online_store={
+            "type": "feast_teradata.online.teradata.TeradataOnlineStore",
+            "host": "localhost",
+            "database": "bench",
+            "user": "bench",
+            "password": "bench",
+            **overrides,
+        },
+        entity_key_serialization_version=2,
+    )
+
+
+def run_case(config: RepoConfig, n_entities: int, n_features: int, value_bytes: int, read_keys: int, reads: int):
+    table = make_feature_view(n_features, value_bytes)
+    data = make_data(n_entities, n_features, value_bytes)
+    feature_names = [f"feature_{j}" for j in range(n_features)]
+    store = TeradataOnlineStore()
+    store.update(config, [], [table], [], [], False)
+    try:
+        start = time.perf_counter()
+        store.online_write_batch(config, table, data, None)
+        write_rows_per_second = n_entities * n_features / (time.perf_counter() - start)
+
+        rng = random.Random(1)
+        latencies = []
+        for _ in range(reads):
+            entities = [rng.randrange(n_entities) for _ in range(read_keys)]
+            entity_keys = [make_entity_key(i) for i in entities]
+            start = time.perf_counter()
+            result = store.online_read(config, table, entity_keys, feature_names)
+            latencies.append((time.perf_counter() - start) * 1000)
+            for i, (event_ts, values) in zip(entities, result):
+                assert values == data[i][1], f"entity {i} must read back the values written for it"
+                assert event_ts == data[i][2], f"entity {i} must read back the event timestamp written for it"
+    finally:
+        store.teardown(config, [table], [])
+    return write_rows_per_second, latencies
+
+
+def run_suite(args):
+    if args.backend == "memory":
+        db = InMemoryTeradata(latency_ms=args.latency_ms)
+        db.install()
+
+    print(
+        f"{'layout':>7} {'entities':>9} {'features':>9} {'value B':>8} "
+        f"{'write rows/s':>13} {'read p50 ms':>12} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    for layout, n_entities, n_features, value_bytes in itertools.product(
+            args.layout, args.entities, args.features, args.value_bytes
+    ):
+        args.layout_name = layout
+        config = make_config(args)
+        write_rows_per_second, latencies = run_case(
+            config, n_entities, n_features, value_bytes, args.read_keys, args.reads
+        )
+        print(
+            f"{layout:>7} {n_entities:>9,} {n_features:>9} {value_bytes:>8} {write_rows_per_second:>13,.0f} "
+            f"{percentile(latencies, 50):>12.2f} {percentile(latencies, 95):>8.2f} {percentile(latencies, 99):>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["memory", "teradata"], default="memory")
+    parser.add_argument("--repo-path", type=Path, help="Feature repository of the teradata backend")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated round trip of the memory backend")
+    parser.add_argument("--layout", nargs="+", choices=["narrow", "wide"], default=["narrow"])
+    parser.add_argument("--write-method", choices=["copy_to_sql", "executemany", "fastload"], default="executemany")
+    parser.add_argument("--entities", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--features", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("--value-bytes", type=int, nargs="+", default=[8, 256])
+    parser.add_argument("--read-keys", type=int, default=10, help="Entities looked up per online_read call")
+    parser.add_argument("--reads", type=int, default=500, help="online_read calls per case")
+    args = parser.parse_args()
+    if args.backend == "teradata" and args.repo_path is None:
+        parser.error("--repo-path is required with --backend teradata")
+    run_suite(args)
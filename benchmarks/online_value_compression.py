@@ -0,0 +1,128 @@
+"""
+Measures what value_compression does to an embedding-heavy feature view: the bytes of the online
+value column that a write uploads and a read fetches, the time online_write_batch spends building
+the staging rows, and the time online_read spends decoding and grouping the fetched rows (best of
+three runs). Every entity has a float embedding and a list of recently seen item ids. Full precision
+embeddings hardly compress; --quantize rounds them to 8-bit levels, as quantized embeddings are.
+
+    python benchmarks/online_value_compression.py --entities 10000 --dim 128 --codecs zlib lz4
+    python benchmarks/online_value_compression.py --entities 10000 --dim 256 --quantize
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from feast import Entity, FeatureView, Field, FileSource, RepoConfig
+from feast.protos.feast.types.EntityKey_pb2 import EntityKey as EntityKeyProto
+from feast.protos.feast.types.Value_pb2 import FloatList, Int64List
+from feast.protos.feast.types.Value_pb2 import Value as ValueProto
+from feast.types import Array, Float32, Int64
+
+from feast_teradata.online.teradata import _group_narrow_rows, _to_staging_columns
+
+
+def make_feature_view() -> FeatureView:
+    return FeatureView(
+        name="bench",
+        entities=[Entity(name="user", join_keys=["user_id"])],
+        schema=[
+            Field(name="embedding", dtype=Array(Float32)),
+            Field(name="recent_items", dtype=Array(Int64)),
+        ],
+        source=FileSource(path="bench.parquet", timestamp_field="event_timestamp"),
+    )
+
+
+def make_embedding(rng: random.Random, dim: int, quantize: bool):
+    if quantize:
+        return [rng.randrange(-127, 128) / 127 for _ in range(dim)]
+    return [rng.gauss(0, 1) for _ in range(dim)]
+
+
+def make_data(n_entities: int, dim: int, n_items: int, quantize: bool):
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    data = []
+    for i in range(n_entities):
+        entity_key = EntityKeyProto(join_keys=["user_id"], entity_values=[ValueProto(int64_val=i)])
+        values = {
+            "embedding": ValueProto(float_list_val=FloatList(val=make_embedding(rng, dim, quantize))),
+            "recent_items": ValueProto(
+                int64_list_val=Int64List(val=[int(rng.paretovariate(0.8)) % 100_000 for _ in range(n_items)])
+            ),
+        }
+        data.append((entity_key, values, now - timedelta(seconds=i), now))
+    return data
+
+
+def make_config(codec, threshold: int) -> RepoConfig:
+    return RepoConfig(
+        project="bench",
+        provider="local",
+        registry="registry.db",
+        online_store={
+            "type": "feast_teradata.online.teradata.TeradataOnlineStore",
+            "host": "localhost",
+            "database": "bench",
+            "user": "bench",
+            "password": "bench",
+            "value_compression": codec,
+            "value_compression_threshold": threshold,
+        },
+        entity_key_serialization_version=2,
+    )
+
+
+def best_ms(fn, *args, repeat: int = 3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, min(timings)
+
+
+def run_codec(codec, threshold: int, table: FeatureView, data):
+    config = make_config(codec, threshold)
+
+    columns, write_ms = best_ms(_to_staging_columns, config, table, data)
+    values = columns["value"]
+    rows = list(zip(columns["entity_key"], columns["feature_name"], values, columns["event_ts"]))
+    _, read_ms = best_ms(_group_narrow_rows, rows)
+
+    total_bytes = sum(len(value) for value in values)
+    over_column = sum(len(value) > 1024 for value in values)
+    return total_bytes, over_column, write_ms, read_ms
+
+
+def run_benchmark(n_entities: int, dim: int, n_items: int, quantize: bool, codecs, threshold: int):
+    table = make_feature_view()
+    data = make_data(n_entities, dim, n_items, quantize)
+    precision = "8-bit" if quantize else "full precision"
+    print(f"{n_entities:,} entities, {dim}-dim {precision} embedding, {n_items} recent items")
+    print(f"{'codec':>6} {'value MB':>10} {'ratio':>7} {'> 1024 B':>9} {'write ms':>10} {'read ms':>10}")
+    baseline = None
+    for codec in [None, *codecs]:
+        try:
+            total_bytes, over_column, write_ms, read_ms = run_codec(codec, threshold, table, data)
+        except ImportError as e:
+            print(f"{codec:>6} skipped: {e}")
+            continue
+        baseline = baseline or total_bytes
+        print(
+            f"{codec or 'none':>6} {total_bytes / 1e6:10.2f} {baseline / total_bytes:7.2f} "
+            f"{over_column:9,} {write_ms:10.1f} {read_ms:10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entities", type=int, default=10_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--items", type=int, default=64)
+    parser.add_argument("--quantize", action="store_true", help="Use 8-bit quantized embeddings")
+    parser.add_argument("--codecs", nargs="+", default=["zlib", "lz4"], choices=["zlib", "lz4"])
+    parser.add_argument("--threshold", type=int, default=256)
+    args = parser.parse_args()
+    run_benchmark(args.entities, args.dim, args.items, args.quantize, args.codecs, args.threshold)
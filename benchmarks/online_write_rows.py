@@ -0,0 +1,122 @@
+"""
+Measures how fast online_write_batch turns feast rows into the staging frame, before any
+database work happens. The "before" numbers come from the per-entity DataFrame builder that
+online_write_batch used to run; the "after" numbers come from the columnar builder.
+
+    python benchmarks/online_write_rows.py --entities 10000 100000 1000000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+from feast import Entity, FeatureView, Field, FileSource, RepoConfig
+from feast.infra.key_encoding_utils import serialize_entity_key
+from feast.protos.feast.types.EntityKey_pb2 import EntityKey as EntityKeyProto
+from feast.protos.feast.types.Value_pb2 import Value as ValueProto
+from feast.types import Float64
+from feast.utils import to_naive_utc
+
+from feast_teradata.online.teradata import NARROW_COLUMNS, _table_columns, _to_staging_columns
+
+
+def make_feature_view(n_features: int) -> FeatureView:
+    return FeatureView(
+        name="bench",
+        entities=[Entity(name="driver", join_keys=["driver_id"])],
+        schema=[Field(name=f"feature_{j}", dtype=Float64) for j in range(n_features)],
+        source=FileSource(path="bench.parquet", timestamp_field="event_timestamp"),
+    )
+
+
+def make_data(n_entities: int, n_features: int):
+    now = datetime.utcnow()
+    data = []
+    for i in range(n_entities):
+        entity_key = EntityKeyProto(
+            join_keys=["driver_id"], entity_values=[ValueProto(int64_val=i)]
+        )
+        values = {
+            f"feature_{j}": ValueProto(double_val=i * 0.5 + j) for j in range(n_features)
+        }
+        data.append((entity_key, values, now - timedelta(seconds=i), now))
+    return data
+
+
+def legacy_staging_df(config: RepoConfig, table: FeatureView, data) -> pd.DataFrame:
+    dfs = [None] * len(data)
+    for i, (entity_key, values, timestamp, created_ts) in enumerate(data):
+        df = pd.DataFrame(columns=list(NARROW_COLUMNS), index=range(0, len(values)))
+
+        timestamp = to_naive_utc(timestamp)
+        if created_ts is not None:
+            created_ts = to_naive_utc(created_ts)
+
+        for j, (feature_name, val) in enumerate(values.items()):
+            df.loc[j, "entity_feature_key"] = serialize_entity_key(
+                entity_key,
+                entity_key_serialization_version=config.entity_key_serialization_version,
+            ) + bytes(feature_name, encoding="utf-8")
+            df.loc[j, "entity_key"] = serialize_entity_key(
+                entity_key,
+                entity_key_serialization_version=config.entity_key_serialization_version,
+            )
+            df.loc[j, "feature_name"] = feature_name
+            df.loc[j, "value"] = val.SerializeToString()
+            df.loc[j, "event_ts"] = timestamp
+            df.loc[j, "created_ts"] = created_ts
+
+        dfs[i] = df
+    return pd.concat(dfs)
+
+
+def staging_df(config: RepoConfig, table: FeatureView, data) -> pd.DataFrame:
+    # The frame online_write_batch hands to copy_to_sql
+    return pd.DataFrame(_to_staging_columns(config, table, data), columns=list(_table_columns(config, table)))
+
+
+def rows_per_second(builder, config: RepoConfig, table: FeatureView, data) -> float:
+    start = time.perf_counter()
+    df = builder(config, table, data)
+    elapsed = time.perf_counter() - start
+    return len(df) / elapsed
+
+
+def run_benchmark(entity_counts, n_features: int, legacy_max: int):
+    config = RepoConfig(
+        project="bench",
+        provider="local",
+        registry="registry.db",
+        online_store={
+            "type": "feast_teradata.online.teradata.TeradataOnlineStore",
+            "host": "localhost",
+            "database": "bench",
+            "user": "bench",
+            "password": "bench",
+        },
+        entity_key_serialization_version=2,
+    )
+    table = make_feature_view(n_features)
+    print(f"{'entities':>10} {'rows':>10} {'before rows/s':>15} {'after rows/s':>15}")
+    for n_entities in entity_counts:
+        data = make_data(n_entities, n_features)
+        after = rows_per_second(staging_df, config, table, data)
+        if n_entities <= legacy_max:
+            before = f"{rows_per_second(legacy_staging_df, config, table, data):15,.0f}"
+        else:
+            before = f"{'skipped':>15}"
+        print(f"{n_entities:>10,} {n_entities * n_features:>10,} {before} {after:15,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entities", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--features", type=int, default=4)
+    parser.add_argument(
+        "--legacy-max",
+        type=int,
+        default=10_000,
+        help="Largest entity count to run the (very slow) legacy builder for",
+    )
+    args = parser.parse_args()
+    run_benchmark(args.entities, args.features, args.legacy_max)
@@ -0,0 +1,243 @@
+"""
+In-memory stand-in for the Teradata connections used by TeradataOnlineStore, so the online store
+benchmarks can run without a Teradata system (for example in CI). It understands the statements the
+online store issues for unpartitioned narrow and wide tables and fails loudly on anything else. An
+optional latency is added to every round trip to model the network.
+
+    db = InMemoryTeradata(latency_ms=1.0)
+    db.install()
+    ...
+    db.uninstall()
+"""
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+_CREATE = re.compile(r'^\s*CREATE\b.*?\bTABLE\s+"?(\w+)"?.*PRIMARY INDEX\s*\("(\w+)"\)', re.S | re.I)
+_DROP = re.compile(r'^\s*DROP\s+TABLE\s+"?(\w+)"?', re.I)
+_INSERT = re.compile(r'^\s*(?:\{fn teradata_try_fastload\})?INSERT\s+INTO\s+"?(\w+)"?\s*\(([^)]*)\)\s*VALUES', re.I)
+_PRUNE = re.compile(r'^\s*DELETE\s+src\s+FROM\s+"?(\w+)"?', re.I)
+_MERGE_VALUES = re.compile(r'^\s*MERGE\s+INTO\s+"?(\w+)"?\s+tar\s+USING\s+VALUES\s*\(.*?\)\s*AS\s+src\s*\(([^)]*)\)', re.S | re.I)
+_MERGE_TABLE = re.compile(r'^\s*MERGE\s+INTO\s+"?(\w+)"?\s+tar\s+USING\s+"?(\w+)"?\s+src\b', re.I)
+_SELECT = re.compile(r'^\s*SELECT\s+(.*?)\s+FROM\s+"?(\w+)"?\s+WHERE\s+"(\w+)"\s+IN\s*\(', re.S | re.I)
+_ESCAPE = re.compile(r'^\s*\{fn teradata_(nativesql|get_errors)\}', re.I)
+
+_PATCHED = ("get_conn", "pooled_connection", "get_teradataml_context", "copy_to_sql")
+""" Module attributes of feast_teradata.online.teradata replaced by install """
+
+
+def _names(column_list: str) -> List[str]:
+    return re.findall(r'"(\w+)"', column_list)
+
+
+def _is_newer(src: Dict[str, Any], tar: Dict[str, Any]) -> bool:
+    return (src["event_ts"], src["created_ts"] or datetime.min) > (tar["event_ts"], tar["created_ts"] or datetime.min)
+
+
+class _Table:
+    def __init__(self, key_column: str):
+        self.key_column = key_column
+        self.rows: Dict[bytes, Dict[str, Any]] = {}
+        self.duplicate_keys = 0
+
+    def insert(self, row: Dict[str, Any]):
+        key = row[self.key_column]
+        if key in self.rows:
+            self.duplicate_keys += 1
+        self.rows[key] = row
+
+
+class _Cursor:
+    def __init__(self, db: "InMemoryTeradata"):
+        self._db = db
+        self._results: List[List[tuple]] = []
+        self.rowcount = -1
+        self.description = None
+
+    def execute(self, sql: str, params: Optional[Sequence] = None):
+        self._results = self._db.run(sql, params)
+
+    def executemany(self, sql: str, rows: Sequence[Sequence]):
+        self._db.run_many(sql, rows)
+        self._results = []
+
+    def fetchall(self) -> List[tuple]:
+        return self._results[0] if self._results else []
+
+    def fetchone(self) -> Optional[tuple]:
+        rows = self.fetchall()
+        return rows[0] if rows else None
+
+    def nextset(self) -> Optional[bool]:
+        if len(self._results) > 1:
+            self._results.pop(0)
+            return True
+        return None
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Connection:
+    def __init__(self, db: "InMemoryTeradata"):
+        self._db = db
+
+    def cursor(self) -> _Cursor:
+        return _Cursor(self._db)
+
+    def execute(self, sql: str):
+        # SQLAlchemy-style execution, as used on get_conn(...).connect()
+        self._db.run(sql, None)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class InMemoryTeradata:
+    """
+    Tables live in dicts keyed by their primary index column. Every request or executemany call
+    counts as one round trip.
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_seconds = latency_ms / 1000
+        self.round_trips = 0
+        self.tables: Dict[str, _Table] = {}
+        self._lock = threading.Lock()
+
+    def install(self):
+        """
+        Route the connections of the online store module, and its copy_to_sql uploads, to this stand-in.
+        """
+        import feast_teradata.online.teradata as online
+
+        self._originals = {name: getattr(online, name) for name in _PATCHED}
+        online.get_conn = lambda config: self
+        online.pooled_connection = lambda config: _Connection(self)
+        online.get_teradataml_context = lambda config: None
+        online.copy_to_sql = self._copy_to_sql
+
+    def uninstall(self):
+        """
+        Restore the connections of the online store module replaced by install.
+        """
+        import feast_teradata.online.teradata as online
+
+        for name, original in self._originals.items():
+            setattr(online, name, original)
+
+    def connect(self) -> _Connection:
+        return _Connection(self)
+
+    def raw_connection(self) -> _Connection:
+        return _Connection(self)
+
+    def run(self, sql: str, params: Optional[Sequence]) -> List[List[tuple]]:
+        self._round_trip()
+        params = list(params or [])
+        results = []
+        with self._lock:
+            for statement in sql.split(";"):
+                if not statement.strip():
+                    continue
+                n_params = statement.count("?")
+                results.append(self._statement(statement, params[:n_params]))
+                params = params[n_params:]
+        return results
+
+    def run_many(self, sql: str, rows: Sequence[Sequence]):
+        self._round_trip()
+        with self._lock:
+            for row in rows:
+                self._statement(sql, list(row))
+
+    def _round_trip(self):
+        with self._lock:
+            self.round_trips += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+    def _copy_to_sql(self, df, table_name: str, if_exists: str, types, primary_index: str):
+        with self._lock:
+            table = self.tables[table_name] = _Table(primary_index)
+            columns = list(df.columns)
+            for values in df.itertuples(index=False, name=None):
+                table.insert(dict(zip(columns, values)))
+
+    def _statement(self, sql: str, params: List[Any]) -> List[tuple]:
+        match = _SELECT.match(sql)
+        if match:
+            columns, table = _names(match.group(1)), self.tables[match.group(2)]
+            # Like Teradata, an IN-list returns every row once, however often its key is repeated
+            rows = (table.rows.get(key) for key in dict.fromkeys(params))
+            return [tuple(row[column] for column in columns) for row in rows if row is not None]
+
+        match = _MERGE_VALUES.match(sql)
+        if match:
+            self._merge(self.tables[match.group(1)], [dict(zip(_names(match.group(2)), params))])
+            return []
+
+        match = _MERGE_TABLE.match(sql)
+        if match:
+            source = self.tables[match.group(2)]
+            if source.duplicate_keys:
+                # Teradata fails a MERGE that updates one target row from several source rows (error 7547),
+                # so writes must stage every key at most once
+                raise RuntimeError(f"{source.duplicate_keys} staged rows of {match.group(2)} repeat a key")
+            self._merge(self.tables[match.group(1)], list(source.rows.values()))
+            return []
+
+        match = _INSERT.match(sql)
+        if match:
+            self.tables[match.group(1)].insert(dict(zip(_names(match.group(2)), params)))
+            return []
+
+        match = _CREATE.match(sql)
+        if match:
+            self.tables[match.group(1)] = _Table(match.group(2))
+            return []
+
+        match = _DROP.match(sql)
+        if match:
+            self.tables.pop(match.group(1), None)
+            return []
+
+        if _PRUNE.match(sql) or _ESCAPE.match(sql):
+            # Stale staged rows are skipped by the freshness check of _merge instead
+            return []
+
+        raise NotImplementedError(f"Statement not supported by the stand-in database: {sql.split()[:4]}")
+
+    @staticmethod
+    def _merge(target: _Table, source_rows: List[Dict[str, Any]]):
+        for src in source_rows:
+            key = src[target.key_column]
+            tar = target.rows.get(key)
+            if tar is None:
+                target.rows[key] = dict(src)
+            elif _is_newer(src, tar):
+                # Only a newer row is applied. Features missing from a newer wide write keep their stored
+                # value, as with the COALESCE of the MERGE; an older row never changes a stored value.
+                for column, value in src.items():
+                    if value is not None or column == "created_ts":
+                        tar[column] = value
@@ -89,6 +89,37 @@ def init_repo():
     click.echo()
 
 
+@cli.command()
+@click.option(
+    "--repo-path",
+    "-r",
+    type=click.Path(exists=True, file_okay=False),
+    default=".",
+    help="Directory containing the feature_store.yaml of the repository",
+)
+@click.option(
+    "--feature-view",
+    "-v",
+    "feature_views",
+    multiple=True,
+    help="Feature view to evict (all feature views with a ttl when omitted)",
+)
+def evict(repo_path: str, feature_views):
+    """Delete online rows older than the ttl of their feature view"""
+    from feast import FeatureStore
+    from feast_teradata.online.teradata import TeradataOnlineStore
+
+    store = FeatureStore(repo_path=repo_path)
+    if feature_views:
+        tables = [store.get_feature_view(name) for name in feature_views]
+    else:
+        tables = store.list_feature_views()
+
+    report = TeradataOnlineStore().evict_expired(store.config, tables)
+    for table_name, (removed, elapsed) in report.items():
+        click.echo(f"{table_name}: removed {removed} rows in {elapsed:.1f}s")
+
+
 if __name__ == '__main__':
     cli()
 
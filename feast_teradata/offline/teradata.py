@@ -1,6 +1,8 @@
 import contextlib
+import logging
 from dataclasses import asdict
 from datetime import datetime
+from operator import itemgetter
 from typing import (
     Any,
     Callable,
@@ -34,24 +36,41 @@ from feast.infra.offline_stores.offline_store import (
 from feast.infra.registry.registry import Registry
 from feast_teradata.teradata_utils import (
     get_conn,
+    pooled_connection,
     TeradataConfig,
     teradata_type_to_feast_value_type,
 )
 from feast_teradata.offline.teradata_source import (
     TeradataSource,
-    df_to_teradata_table
+    create_table_from_df
 )
 from feast.on_demand_feature_view import OnDemandFeatureView
 from feast.repo_config import RepoConfig
 from feast.saved_dataset import SavedDatasetStorage
 from feast.usage import log_exceptions_and_usage
 
+logger = logging.getLogger(__name__)
+
 
 class TeradataOfflineStoreConfig(TeradataConfig):
     type: Literal[
         "feast_teradata.offline.teradata.TeradataOfflineStore"
     ] = "feast_teradata.offline.teradata.TeradataOfflineStore"
 
+    fetch_batch_size: int = 50000
+    """ Rows fetched and converted to Arrow at a time when reading retrieval results """
+
+    entity_upload_batch_size: int = 10000
+    """ Rows sent per executemany call when uploading an entity DataFrame """
+
+    entity_upload_fastload_min_rows: Optional[int] = 100000
+    """ Upload entity DataFrames of at least this many rows with FastLoad (unset never uses FastLoad),
+    only used when entity_table_volatile is false """
+
+    entity_table_volatile: bool = True
+    """ Create the entity table of get_historical_features as a volatile table, which needs no
+    permanent space or data dictionary entries and is dropped with the session even after a crash """
+
 
 class TeradataOfflineStore(OfflineStore):
     @staticmethod
@@ -135,11 +154,9 @@ class TeradataOfflineStore(OfflineStore):
         )
 
         @contextlib.contextmanager
-        def query_generator() -> Iterator[str]:
+        def query_generator() -> Iterator[Tuple[Any, str]]:
             table_name = offline_utils.get_temp_entity_table_name()
 
-            _upload_entity_df(config, entity_df, table_name)
-
             expected_join_keys = offline_utils.get_expected_join_keys(
                 project, feature_views, registry
             )
@@ -164,19 +181,28 @@ class TeradataOfflineStore(OfflineStore):
                     for entity_selection in context["entity_selections"]
                 ]
 
-            try:
-                yield build_point_in_time_query(
-                    query_context_dict,
-                    left_table_query_string=table_name,
-                    entity_df_event_timestamp_col=entity_df_event_timestamp_col,
-                    entity_df_columns=entity_schema.keys(),
-                    query_template=MULTIPLE_FEATURE_VIEW_POINT_IN_TIME_JOIN,
-                    full_feature_names=full_feature_names,
-                )
-            finally:
-                if table_name:
-                    with get_conn(config.offline_store).connect() as conn:
-                        conn.execute(f"DROP TABLE {table_name}")
+            # A volatile entity table only exists in the session that created it, so the upload,
+            # the retrieval and the drop run on one connection, which the retrieval job reads from
+            with pooled_connection(config.offline_store, exclusive=True) as conn:
+                try:
+                    _upload_entity_df(
+                        conn,
+                        config,
+                        entity_df,
+                        table_name,
+                        [column for column in entity_schema if column in expected_join_keys],
+                        entity_df_event_timestamp_col,
+                    )
+                    yield conn, build_point_in_time_query(
+                        query_context_dict,
+                        left_table_query_string=table_name,
+                        entity_df_event_timestamp_col=entity_df_event_timestamp_col,
+                        entity_df_columns=entity_schema.keys(),
+                        query_template=MULTIPLE_FEATURE_VIEW_POINT_IN_TIME_JOIN,
+                        full_feature_names=full_feature_names,
+                    )
+                finally:
+                    _drop_entity_table(conn, table_name)
 
         return TeradataRetrievalJob(
             query=query_generator,
@@ -259,7 +285,7 @@ class TeradataOfflineStore(OfflineStore):
 class TeradataRetrievalJob(RetrievalJob):
     def __init__(
             self,
-            query: Union[str, Callable[[], ContextManager[str]]],
+            query: Union[str, Callable[[], ContextManager[Tuple[Any, str]]]],
             config: RepoConfig,
             full_feature_names: bool,
             on_demand_feature_views: Optional[List[OnDemandFeatureView]],
@@ -270,9 +296,10 @@ class TeradataRetrievalJob(RetrievalJob):
         else:
 
             @contextlib.contextmanager
-            def query_generator() -> Iterator[str]:
+            def query_generator() -> Iterator[Tuple[Any, str]]:
                 assert isinstance(query, str)
-                yield query
+                with pooled_connection(config.offline_store, exclusive=True) as conn:
+                    yield conn, query
 
             self._query_generator = query_generator
         self.config = config
@@ -293,30 +320,52 @@ class TeradataRetrievalJob(RetrievalJob):
         return self._to_arrow_internal().to_pandas()
 
     def to_sql(self) -> str:
-        with self._query_generator() as query:
+        with self._query_generator() as (_, query):
             return query
 
     def _to_arrow_internal(self, timeout: Optional[int] = None) -> pa.Table:
-        with self._query_generator() as query:
-            with get_conn(self.config.offline_store).raw_connection().cursor() as cur:
+        with self._query_generator() as (conn, query):
+            with conn.cursor() as cur:
                 cur.execute(query)
-                fields = [
-                    (c[0], teradata_type_to_feast_value_type(c[1]))
-                    for c in cur.description
-                ]
-                data = cur.fetchall()
-                schema = pa.schema(fields)
-
-                data_transposed: List[List[Any]] = []
-                for col in range(len(fields)):
-                    data_transposed.append([])
-                    for row in range(len(data)):
-                        data_transposed[col].append(data[row][col])
-                table = pa.Table.from_arrays(
-                    [pa.array(row) for row in data_transposed], schema=schema
+                schema = _cursor_schema(cur)
+                batches = list(_fetch_record_batches(cur, schema, self.config.offline_store.fetch_batch_size))
+                return pa.Table.from_batches(batches, schema=schema)
+
+    def _to_arrow_batches_internal(self, batch_size: Optional[int] = None) -> Iterator[pa.RecordBatch]:
+        # The query generator checks out a connection of its own, so other checkouts on this thread,
+        # including other iterators, never share it while this one is suspended
+        with self._query_generator() as (conn, query):
+            with conn.cursor() as cur:
+                cur.execute(query)
+                yield from _fetch_record_batches(
+                    cur, _cursor_schema(cur), batch_size or self.config.offline_store.fetch_batch_size
                 )
 
-            return table
+    def to_arrow_batches(self, batch_size: Optional[int] = None) -> Iterator[pa.RecordBatch]:
+        """
+        Execute the query and yield the result as Arrow record batches of up to batch_size rows
+        (fetch_batch_size by default), straight from the cursor, so results larger than memory can
+        be processed batch by batch. On demand transformations are applied to every batch.
+
+        The connection and any uploaded entity table are held until the iterator is exhausted or closed.
+        """
+        if not self.on_demand_feature_views:
+            yield from self._to_arrow_batches_internal(batch_size)
+            return
+        for df in self.to_df_iter(batch_size):
+            yield pa.RecordBatch.from_pandas(df, preserve_index=False)
+
+    def to_df_iter(self, batch_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        Execute the query and yield the result as DataFrames of up to batch_size rows, see to_arrow_batches.
+        """
+        for batch in self._to_arrow_batches_internal(batch_size):
+            features_df = batch.to_pandas()
+            for odfv in self.on_demand_feature_views:
+                features_df = features_df.join(
+                    odfv.get_transformed_features_df(features_df, self.full_feature_names)
+                )
+            yield features_df
 
     @property
     def metadata(self) -> Optional[RetrievalMetadata]:
@@ -326,6 +375,30 @@ class TeradataRetrievalJob(RetrievalJob):
         raise NotImplementedError("Not yet implemented")
 
 
+def _cursor_schema(cur) -> pa.Schema:
+    return pa.schema([
+        (c[0], teradata_type_to_feast_value_type(c[1]))
+        for c in cur.description
+    ])
+
+
+def _fetch_record_batches(cur, schema: pa.Schema, batch_size: int) -> Iterator[pa.RecordBatch]:
+    """
+    Fetch the result of an executed cursor batch_size rows at a time, converting each batch to
+    Arrow before fetching the next, so only one batch is held as Python tuples at any time.
+    """
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            return
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(map(itemgetter(i), rows), type=field.type, size=len(rows)) for i, field in enumerate(schema)],
+            schema=schema,
+        )
+        del rows
+        yield batch
+
+
 def _get_entity_df_event_timestamp_range(
         entity_df: Union[pd.DataFrame, str],
         entity_df_event_timestamp_col: str,
@@ -346,7 +419,7 @@ def _get_entity_df_event_timestamp_range(
     elif isinstance(entity_df, str):
         # If the entity_df is a string (SQL query), determine range
         # from table
-        with get_conn(config.offline_store).raw_connection().cursor() as cur:
+        with pooled_connection(config.offline_store) as conn, conn.cursor() as cur:
             cur.execute(
                 f"SELECT MIN({entity_df_event_timestamp_col}) AS min_ts, MAX({entity_df_event_timestamp_col}) AS max_ts FROM ({entity_df}) as tmp_alias"
             ),
@@ -403,20 +476,66 @@ def build_point_in_time_query(
 
 
 def _upload_entity_df(
-        config: RepoConfig, entity_df: Union[pd.DataFrame, str], table_name: str
+        conn,
+        config: RepoConfig,
+        entity_df: Union[pd.DataFrame, str],
+        table_name: str,
+        join_keys: List[str],
+        entity_df_event_timestamp_col: str,
 ):
+    """
+    Create the entity table of a point-in-time join, with its primary index on the join keys so it
+    is spread evenly and joins on the keys stay AMP-local, and collect statistics on the keys and
+    the event timestamp for the join plan.
+    """
+    offline_config = config.offline_store
+    volatile = offline_config.entity_table_volatile
+    table_options = _entity_table_options(join_keys, volatile)
     if isinstance(entity_df, pd.DataFrame):
         # If the entity_df is a pandas dataframe, upload it to Postgres
-        df_to_teradata_table(config.offline_store, entity_df, table_name)
+        create_table_from_df(
+            conn,
+            entity_df,
+            table_name,
+            batch_size=offline_config.entity_upload_batch_size,
+            # FastLoad runs in sessions of its own, which cannot see a volatile table
+            fastload_min_rows=None if volatile else offline_config.entity_upload_fastload_min_rows,
+            volatile=volatile,
+            table_options=table_options,
+        )
     elif isinstance(entity_df, str):
-        with get_conn(config.offline_store).raw_connection().cursor() as cur:
-            cur.execute(f"CREATE TABLE {table_name} AS ({entity_df}) with data")
-
-    #     # If the entity_df is a string (SQL query), create a Postgres table out of it
-    #         cur.execute(f"CREATE TABLE {table_name} AS ({entity_df})")
+        table_kind = "VOLATILE " if volatile else ""
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE MULTISET {table_kind}TABLE {table_name} AS ({entity_df}) WITH DATA {table_options}")
     else:
         raise InvalidEntityType(type(entity_df))
 
+    statistics = [f'COLUMN ("{entity_df_event_timestamp_col}")']
+    if join_keys:
+        statistics.insert(0, f"COLUMN ({_quoted_columns(join_keys)})")
+    with conn.cursor() as cur:
+        cur.execute(f"COLLECT STATISTICS {', '.join(statistics)} ON {table_name}")
+
+
+def _drop_entity_table(conn, table_name: str):
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE {table_name}")
+    except Exception as e:
+        # The table may not exist if the upload failed before creating it; never mask the original error
+        logger.warning("Could not drop entity table %s: %s", table_name, e)
+
+
+def _entity_table_options(join_keys: List[str], volatile: bool) -> str:
+    table_options = f"PRIMARY INDEX ({_quoted_columns(join_keys)})" if join_keys else "NO PRIMARY INDEX"
+    if volatile:
+        table_options += " ON COMMIT PRESERVE ROWS"
+    return table_options
+
+
+def _quoted_columns(columns: List[str]) -> str:
+    return ", ".join(f'"{column}"' for column in columns)
+
 
 def _get_entity_schema(
         entity_df: Union[pd.DataFrame, str],
@@ -452,37 +571,19 @@ def get_query_schema(config: TeradataConfig, sql_query: str) -> Dict[str, np.dty
 
 MULTIPLE_FEATURE_VIEW_POINT_IN_TIME_JOIN = """
 /*
-Compute a deterministic hash for the `left_table_query_string` that will be used throughout
-all the logic as the field to GROUP BY the data
+Every entity row is identified by its typed entity columns plus its timestamp. This composite key
+is used throughout all the logic as the fields to GROUP BY, PARTITION BY and join the data on
 */
 WITH "entity_dataframe" AS (
     SELECT a.*,
         "{{entity_df_event_timestamp_col}}" AS "entity_timestamp"
-        {% for featureview in featureviews %}
-            {% if featureview.entities %}
-            ,(
-                {% for entity in featureview.entities %}
-                    CAST("{{entity}}" AS VARCHAR(256)) ||
-                {% endfor %}
-                CAST("{{entity_df_event_timestamp_col}}" AS VARCHAR(256))
-            ) AS "{{featureview.name}}__entity_row_unique_id"
-            {% else %}
-            ,CAST("{{entity_df_event_timestamp_col}}" AS VARCHAR(1000)) AS "{{featureview.name}}__entity_row_unique_id"
-            {% endif %}
-        {% endfor %}
     FROM "{{ left_table_query_string }}" a
 ),
 {% for featureview in featureviews %}
 "{{ featureview.name }}__entity_dataframe" AS (
-    SELECT
-       {{ featureview.entities | map('tojson') | join(', ')}}{% if featureview.entities %},{% else %}{% endif %}
-        "entity_timestamp",
-        "{{featureview.name}}__entity_row_unique_id"
+    SELECT DISTINCT
+        {% for entity in featureview.entities %}"{{ entity }}", {% endfor %}"entity_timestamp"
     FROM "entity_dataframe"
-    GROUP BY
-        {{ featureview.entities | map('tojson') | join(', ')}}{% if featureview.entities %},{% else %}{% endif %}
-        "entity_timestamp",
-        "{{featureview.name}}__entity_row_unique_id"
 ),
 /*
 This query template performs the point-in-time correctness join for a single feature set table
@@ -493,8 +594,8 @@ This JOIN has the following logic:
     is less than the one provided in the entity dataframe
     - If there a TTL for the current feature_view, also keep the rows where the `timestamp_field`
     is higher the the one provided minus the TTL
-    - For each row, Join on the entity key and retrieve the `entity_row_unique_id` that has been
-    computed previously
+    - For each row, Join on the entity key and keep the `entity_timestamp`, which together with
+    the entity columns identifies the entity row
 The output of this CTE will contain all the necessary information and already filtered out most
 of the data that is not relevant.
 */
@@ -515,8 +616,7 @@ of the data that is not relevant.
 "{{ featureview.name }}__base" AS (
     SELECT
         "subquery".*,
-        "entity_dataframe"."entity_timestamp",
-        "entity_dataframe"."{{featureview.name}}__entity_row_unique_id"
+        "entity_dataframe"."entity_timestamp"
     FROM "{{ featureview.name }}__subquery" AS "subquery"
     INNER JOIN "{{ featureview.name }}__entity_dataframe" AS "entity_dataframe"
     ON 1=1
@@ -539,11 +639,11 @@ We then join the data on the next CTE
 {% if featureview.created_timestamp_column %}
 "{{ featureview.name }}__dedup" AS (
     SELECT
-        "{{featureview.name}}__entity_row_unique_id",
+        {% for entity in featureview.entities %}"{{ entity }}", {% endfor %}"entity_timestamp",
         "event_timestamp",
         MAX("created_timestamp") AS "created_timestamp"
     FROM "{{ featureview.name }}__base"
-    GROUP BY "{{featureview.name}}__entity_row_unique_id", "event_timestamp"
+    GROUP BY {% for entity in featureview.entities %}"{{ entity }}", {% endfor %}"entity_timestamp", "event_timestamp"
 ),
 {% endif %}
 /*
@@ -554,18 +654,21 @@ Thus we only need to compute the latest timestamp of each feature.
     SELECT
         "event_timestamp",
         {% if featureview.created_timestamp_column %}"created_timestamp",{% endif %}
-        "{{featureview.name}}__entity_row_unique_id"
+        {% for entity in featureview.entities %}"{{ entity }}", {% endfor %}"entity_timestamp"
     FROM
     (
         SELECT b.*,
             ROW_NUMBER() OVER(
-                PARTITION BY b."{{featureview.name}}__entity_row_unique_id"
+                PARTITION BY {% for entity in featureview.entities %}b."{{ entity }}", {% endfor %}b."entity_timestamp"
                 ORDER BY b."event_timestamp" DESC{% if featureview.created_timestamp_column %},b."created_timestamp" DESC{% endif %}
             ) AS "row_number"
         FROM "{{ featureview.name }}__base" b
         {% if featureview.created_timestamp_column %}
             INNER JOIN "{{ featureview.name }}__dedup" bb
-            ON b."{{featureview.name}}__entity_row_unique_id" = bb."{{featureview.name}}__entity_row_unique_id"
+            ON b."entity_timestamp" = bb."entity_timestamp"
+            {% for entity in featureview.entities %}
+            AND b."{{ entity }}" = bb."{{ entity }}"
+            {% endfor %}
             AND b."event_timestamp" = bb."event_timestamp"
             AND b."created_timestamp" = bb."created_timestamp"
         {% endif %}
@@ -580,7 +683,10 @@ we can join again the data back to the original "base" dataset
     SELECT "base".*
     FROM "{{ featureview.name }}__base" AS "base"
     INNER JOIN "{{ featureview.name }}__latest"
-    ON "base"."{{featureview.name}}__entity_row_unique_id" = "{{ featureview.name }}__latest"."{{featureview.name}}__entity_row_unique_id"
+    ON "base"."entity_timestamp" = "{{ featureview.name }}__latest"."entity_timestamp"
+    {% for entity in featureview.entities %}
+    AND "base"."{{ entity }}" = "{{ featureview.name }}__latest"."{{ entity }}"
+    {% endfor %}
     AND "base"."event_timestamp" = "{{ featureview.name }}__latest"."event_timestamp"
 
     {% if featureview.created_timestamp_column %}
@@ -592,17 +698,21 @@ we can join again the data back to the original "base" dataset
 /*
 Joins the outputs of multiple time travel joins to a single table.
 The entity_dataframe dataset being our source of truth here.
+The key columns of each feature view are renamed so they do not clash with the entity columns.
 */
 SELECT "{{ final_output_feature_names | join('", "')}}"
 FROM "entity_dataframe"
 {% for featureview in featureviews %}
 LEFT JOIN (
     SELECT
-        "{{featureview.name}}__entity_row_unique_id"
+        {% for entity in featureview.entities %}"{{ entity }}" AS "{{ featureview.name }}__{{ entity }}", {% endfor %}"entity_timestamp" AS "{{ featureview.name }}__entity_timestamp"
         {% for feature in featureview.features %}
             ,{% if full_feature_names %}"{{ featureview.name }}__{{featureview.field_mapping.get(feature, feature)}}"{% else %}"{{ featureview.field_mapping.get(feature, feature) }}"{% endif %}
         {% endfor %}
     FROM "{{ featureview.name }}__cleaned"
-) "{{ featureview.name }}__cleaned" ON "entity_dataframe"."{{featureview.name}}__entity_row_unique_id"="{{ featureview.name }}__cleaned"."{{featureview.name}}__entity_row_unique_id"
+) "{{ featureview.name }}__cleaned" ON "entity_dataframe"."entity_timestamp" = "{{ featureview.name }}__cleaned"."{{ featureview.name }}__entity_timestamp"
+{% for entity in featureview.entities %}
+    AND "entity_dataframe"."{{ entity }}" = "{{ featureview.name }}__cleaned"."{{ featureview.name }}__{{ entity }}"
+{% endfor %}
 {% endfor %}
 """
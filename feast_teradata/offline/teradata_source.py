@@ -1,5 +1,5 @@
 import json
-from typing import Callable, Dict, Iterable, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 from typeguard import typechecked
 
 from feast.data_source import DataSource
@@ -15,7 +15,8 @@ import pandas as pd
 import numpy as np
 
 from feast_teradata.teradata_utils import (
-    get_conn,
+    bulk_insert,
+    pooled_connection,
     TeradataConfig
 )
 from teradataml import DataFrame
@@ -144,7 +145,7 @@ class TeradataSource(DataSource):
     def get_table_column_names_and_types(
             self, config: RepoConfig
     ) -> Iterable[Tuple[str, str]]:
-        with get_conn(config.offline_store).raw_connection().cursor() as cur:
+        with pooled_connection(config.offline_store) as conn, conn.cursor() as cur:
             # df = pd.read_sql(f"SELECT * FROM {self.get_table_query_string()} sample 1", conn)
             # column_names = df.columns
             # types = df.dtypes
@@ -218,13 +219,80 @@ class SavedDatasetTeradataStorage(SavedDatasetStorage):
         return TeradataSource(table=self.teradata_options._table)
 
 
-def df_to_teradata_table(config: TeradataConfig, df: pd.DataFrame, table_name: str) -> Dict[str, np.dtype]:
+def df_to_teradata_table(
+        config: TeradataConfig,
+        df: pd.DataFrame,
+        table_name: str,
+        batch_size: int = 10000,
+        fastload_min_rows: Optional[int] = None,
+) -> Dict[str, np.dtype]:
     """
     Create a table for the data frame, insert all the values, and return the table schema
     """
+    with pooled_connection(config) as conn:
+        return create_table_from_df(conn, df, table_name, batch_size, fastload_min_rows)
+
+
+def create_table_from_df(
+        conn,
+        df: pd.DataFrame,
+        table_name: str,
+        batch_size: int = 10000,
+        fastload_min_rows: Optional[int] = None,
+        volatile: bool = False,
+        table_options: str = "NO PRIMARY INDEX",
+) -> Dict[str, np.dtype]:
+    """
+    Create a table for the data frame on conn, insert all the values, and return the table schema.
 
-    with get_conn(config).connect() as conn:
-        col_type_dict = dict(zip(df.columns, df.dtypes))
-        df.to_sql(name=table_name, con=conn, if_exists='replace', index=False)
-
-        return col_type_dict
+    The columns get explicit Teradata types and the rows are bulk inserted batch_size at a time,
+    with FastLoad for frames of at least fastload_min_rows rows. table_options follow the column
+    definitions, such as the primary index.
+    """
+    column_types = {name: _teradata_column_type(df[name]) for name in df.columns}
+    column_defs = ",\n".join(f'"{name}" {sql_type}' for name, sql_type in column_types.items())
+    columns = [_column_values(df[name]) for name in df.columns]
+    fastload = fastload_min_rows is not None and len(df) >= fastload_min_rows
+
+    with conn.cursor() as cur:
+        table_kind = "VOLATILE " if volatile else ""
+        cur.execute(f"CREATE MULTISET {table_kind}TABLE {table_name} (\n{column_defs}\n) {table_options}")
+        bulk_insert(conn, cur, table_name, list(df.columns), zip(*columns), batch_size, fastload=fastload)
+
+    return dict(zip(df.columns, df.dtypes))
+
+
+def _teradata_column_type(series: pd.Series) -> str:
+    inferred = pd.api.types.infer_dtype(series, skipna=True)
+    if inferred == "boolean":
+        return "BYTEINT"
+    if inferred == "integer":
+        return "BIGINT"
+    if inferred in ("floating", "mixed-integer-float", "decimal"):
+        return "FLOAT"
+    if inferred in ("datetime64", "datetime"):
+        return "TIMESTAMP(6)"
+    if inferred == "date":
+        return "DATE"
+    if inferred == "bytes":
+        return "VARBYTE(64000)"
+    if inferred in ("string", "empty"):
+        max_length = series.dropna().str.len().max() if inferred == "string" else 0
+        return f"VARCHAR({max(int(max_length), 1)}) CHARACTER SET UNICODE"
+    raise ValueError(f"Entity DataFrame column {series.name} of type {inferred} cannot be uploaded to Teradata")
+
+
+def _column_values(series: pd.Series) -> List[Any]:
+    """
+    Values of series as the Python objects teradatasql binds, with missing values as None.
+    Timezone-aware timestamps are converted to UTC.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        if series.dt.tz is not None:
+            series = series.dt.tz_convert("UTC").dt.tz_localize(None)
+        values = list(series.dt.to_pydatetime())
+    else:
+        values = series.tolist()
+    if series.hasnans:
+        values = [None if missing else value for value, missing in zip(values, series.isna())]
+    return values
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from feast.protos.feast.types.Value_pb2 import Value as ValueProto
+
+CacheKey = Tuple[str, bytes, str]
+""" (online table, serialized entity key, feature name) """
+
+MISSING = object()
+""" Cached marker for a feature known to be absent from the online table """
+
+
+class OnlineReadCache:
+    """
+    Thread-safe, in-process LRU cache of online feature values with a time to live.
+
+    Entries hold either an (event_ts, value) pair or MISSING when negative caching is enabled.
+    Hit and miss counters are kept so the cache can be sized from real traffic.
+
+    Every invalidation moves the generation of the invalidated table forward. A reader takes the
+    generation before it reads Teradata and passes it to put, so a value read before a concurrent
+    write is not cached after that write has invalidated it.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, cache_missing: bool):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.cache_missing = cache_missing
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[CacheKey, Tuple[float, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self._generations: Dict[str, int] = {}
+        self._cleared_at = 0
+
+    def generation(self, table_id: str) -> int:
+        """
+        Current generation of the cached values of an online table.
+        """
+        with self._lock:
+            return self._generation(table_id)
+
+    def _generation(self, table_id: str) -> int:
+        return max(self._generations.get(table_id, 0), self._cleared_at)
+
+    def get(self, key: CacheKey) -> Optional[object]:
+        """
+        Return the cached (event_ts, value) pair or MISSING, or None when the key is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: CacheKey, value: Tuple[datetime, ValueProto], generation: Optional[int] = None):
+        """
+        Cache a value, unless its table was invalidated since generation was taken.
+        """
+        self._set(key, value, generation)
+
+    def put_missing(self, key: CacheKey, generation: Optional[int] = None):
+        if self.cache_missing:
+            self._set(key, MISSING, generation)
+
+    def _set(self, key: CacheKey, value: object, generation: Optional[int]):
+        with self._lock:
+            if generation is not None and generation != self._generation(key[0]):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, keys: Iterable[CacheKey]):
+        with self._lock:
+            table_ids = set()
+            for key in keys:
+                self._entries.pop(key, None)
+                table_ids.add(key[0])
+            for table_id in table_ids:
+                self._bump(table_id)
+
+    def invalidate_table(self, table_id: str):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == table_id]:
+                del self._entries[key]
+            self._bump(table_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version += 1
+            self._cleared_at = self._version
+
+    def _bump(self, table_id: str):
+        self._version += 1
+        self._generations[table_id] = self._version
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
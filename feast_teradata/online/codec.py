@@ -0,0 +1,69 @@
+import zlib
+from typing import Callable, Dict, Optional
+
+from feast.protos.feast.types.Value_pb2 import Value as ValueProto
+
+HEADER = b"\x00"
+"""
+Leading byte of an encoded value. A serialized ValueProto never starts with it (every field tag is
+non-zero), so encoded and plain values can live side by side in one online table.
+"""
+
+CODEC_IDS: Dict[str, bytes] = {
+    "zlib": b"\x01",
+    "lz4": b"\x02",
+}
+
+
+def _lz4():
+    try:
+        import lz4.frame
+    except ImportError as e:
+        raise ImportError(
+            "value_compression: lz4 requires the lz4 package, install it with `pip install 'feast-teradata[lz4]'`"
+        ) from e
+    return lz4.frame
+
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == "zlib":
+        return zlib.compress(data, 1)
+    return _lz4().compress(data)
+
+
+def _decompress(codec_id: bytes, data: bytes) -> bytes:
+    if codec_id == CODEC_IDS["zlib"]:
+        return zlib.decompress(data)
+    if codec_id == CODEC_IDS["lz4"]:
+        return _lz4().decompress(data)
+    raise ValueError(f"Unknown online value codec id {codec_id!r}")
+
+
+def value_encoder(codec: Optional[str], threshold: int) -> Callable[[ValueProto], bytes]:
+    """
+    Return the function serializing feature values for the online table. Values of at least
+    threshold bytes are compressed with codec, unless that does not make them smaller.
+    """
+    if codec is None:
+        return ValueProto.SerializeToString
+    if codec == "lz4":
+        _lz4()  # fail on the first write rather than on the first large value
+    prefix = HEADER + CODEC_IDS[codec]
+
+    def encode(val: ValueProto) -> bytes:
+        data = val.SerializeToString()
+        if len(data) < threshold:
+            return data
+        compressed = prefix + _compress(codec, data)
+        return compressed if len(compressed) < len(data) else data
+
+    return encode
+
+
+def decode_value(data: bytes) -> bytes:
+    """
+    Return the serialized ValueProto stored in data, whether or not it was compressed.
+    """
+    if data[:1] != HEADER:
+        return data
+    return _decompress(data[1:2], data[2:])
@@ -0,0 +1,115 @@
+import contextlib
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+MetricsHook = Callable[[str, str, float, int, int], None]
+""" hook(operation, phase, seconds, rows, bytes), called once per phase of every online store call """
+
+
+class OnlineStoreMetrics:
+    """
+    Thread-safe registry of per-phase counters (calls, seconds, rows and bytes) of the online store.
+
+    It is a MetricsHook itself, so metrics_hook can point at an instance, and render_prometheus
+    returns the counters in the Prometheus text exposition format for a scrape endpoint.
+    """
+
+    COUNTERS = ("calls", "seconds", "rows", "bytes")
+
+    def __init__(self):
+        self._counters: Dict[Tuple[str, str], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, operation: str, phase: str, seconds: float, rows: int, n_bytes: int):
+        with self._lock:
+            counters = self._counters.get((operation, phase))
+            if counters is None:
+                counters = self._counters[(operation, phase)] = [0, 0.0, 0, 0]
+            counters[0] += 1
+            counters[1] += seconds
+            counters[2] += rows
+            counters[3] += n_bytes
+
+    def snapshot(self) -> Dict[Tuple[str, str], Dict[str, float]]:
+        with self._lock:
+            return {
+                key: dict(zip(self.COUNTERS, counters))
+                for key, counters in self._counters.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+    def render_prometheus(self, prefix: str = "feast_teradata_online") -> str:
+        snapshot = self.snapshot()
+        lines = []
+        for counter in self.COUNTERS:
+            name = f"{prefix}_phase_{counter}_total"
+            lines.append(f"# HELP {name} Online store {counter} by operation and phase")
+            lines.append(f"# TYPE {name} counter")
+            for (operation, phase), counters in sorted(snapshot.items()):
+                lines.append(f'{name}{{operation="{operation}",phase="{phase}"}} {counters[counter]}')
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = OnlineStoreMetrics()
+""" Process-wide registry, enabled with metrics_hook: feast_teradata.online.metrics.REGISTRY """
+
+
+class Phase:
+    """
+    Rows and bytes handled by a phase, set by the timed block.
+    """
+    __slots__ = ("rows", "bytes")
+
+    def __init__(self):
+        self.rows = 0
+        self.bytes = 0
+
+
+class PhaseRecorder:
+    """
+    Times the phases of one online store call and reports each of them to the hook.
+    """
+
+    enabled = True
+
+    def __init__(self, hook: MetricsHook, operation: str):
+        self._hook = hook
+        self._operation = operation
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[Phase]:
+        phase = Phase()
+        start = time.perf_counter()
+        try:
+            yield phase
+        finally:
+            elapsed = time.perf_counter() - start
+            try:
+                self._hook(self._operation, name, elapsed, phase.rows, phase.bytes)
+            except Exception as e:
+                # Metrics must never fail a read or a write
+                logger.warning("Online store metrics hook failed: %s", e)
+
+
+class _NullRecorder:
+    """
+    Recorder used when no hook is configured: every phase is a shared no-op context.
+    """
+
+    enabled = False
+
+    def __init__(self):
+        self._phase = contextlib.nullcontext(Phase())
+
+    def phase(self, name: str):
+        return self._phase
+
+
+NULL_RECORDER = _NullRecorder()
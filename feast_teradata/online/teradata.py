@@ -1,20 +1,34 @@
-from datetime import datetime
-from typing import Sequence, List, Optional, Tuple, Dict, Callable, Any
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Sequence, List, Optional, Tuple, Dict, Callable, Any, Iterable
 
+import logging
 import pytz
 import itertools
-from binascii import hexlify
+import uuid
+from feast.importer import import_class
 from feast.usage import log_exceptions_and_usage
 from feast import RepoConfig, FeatureView, Entity
 from feast.infra.key_encoding_utils import serialize_entity_key
 from feast.infra.online_stores.online_store import OnlineStore
 from feast.protos.feast.types.EntityKey_pb2 import EntityKey as EntityKeyProto
 from feast.protos.feast.types.Value_pb2 import Value as ValueProto
+from pydantic import PositiveInt, StrictStr, root_validator
 from pydantic.typing import Literal
 import pandas as pd
 from feast.utils import to_naive_utc
+from feast_teradata.online.cache import MISSING, OnlineReadCache
+from feast_teradata.online.codec import decode_value, value_encoder
+from feast_teradata.online.metrics import NULL_RECORDER, MetricsHook, PhaseRecorder
 from feast_teradata.teradata_utils import (
+    bulk_insert,
     get_conn,
+    get_teradataml_context,
+    pooled_connection,
     TeradataConfig
 )
 from teradataml import (
@@ -22,9 +36,19 @@ from teradataml import (
     VARBYTE,
     VARCHAR,
     TIMESTAMP,
-    DataFrame
 )
 
+logger = logging.getLogger(__name__)
+
+NARROW_COLUMNS: Dict[str, str] = {
+    "entity_feature_key": "VARBYTE(512)",
+    "entity_key": "VARBYTE(512)",
+    "feature_name": "VARCHAR(512)",
+    "value": "VARBYTE(1024)",
+    "event_ts": "TIMESTAMP",
+    "created_ts": "TIMESTAMP",
+}
+
 types_dict = {
     "entity_feature_key": VARBYTE(512),
     "entity_key": VARBYTE(512),
@@ -40,9 +64,194 @@ class TeradataOnlineStoreConfig(TeradataConfig):
         "feast_teradata.online.teradata.TeradataOnlineStore"
     ] = "feast_teradata.online.teradata.TeradataOnlineStore"
 
+    write_method: Literal["copy_to_sql", "executemany", "fastload"] = "copy_to_sql"
+    """ How staged rows are uploaded: teradataml copy_to_sql, batched parameterized inserts, or FastLoad """
+
+    write_batch_size: int = 10000
+    """ Number of rows sent per executemany call when write_method is executemany or fastload """
+
+    direct_write_threshold: int = 0
+    """ Batches with at most this many rows skip the staging table and are upserted directly (0 disables) """
+
+    write_chunk_size: Optional[int] = None
+    """ (optional) Number of entities staged and merged at a time; progress is reported per chunk """
+
+    read_chunk_size: int = 500
+    """ Maximum number of keys bound into a single online_read statement """
+
+    read_key_buckets: List[int] = [1, 8, 32, 128]
+    """ Key counts that online read statements are padded up to, so they reuse the same SQL text; chunks
+    larger than the largest bucket are padded to read_chunk_size (empty disables padding) """
+
+    read_max_workers: int = 4
+    """ Maximum number of online_read chunks fetched in parallel """
+
+    async_max_workers: int = 8
+    """ Maximum number of online_read_async/online_write_batch_async calls running against Teradata at once """
+
+    cache_max_size: int = 0
+    """ Maximum number of (feature view, entity, feature) values kept in the in-process read cache (0 disables) """
+
+    cache_ttl_seconds: float = 60
+    """ Seconds a cached value is served before it is read from Teradata again """
+
+    cache_missing: bool = True
+    """ Also cache features that were not found, so repeated lookups of unknown entities skip Teradata """
+
+    value_compression: Optional[Literal["zlib", "lz4"]] = None
+    """ Codec used to compress large feature values in the online table (unset stores them uncompressed) """
+
+    value_compression_threshold: int = 256
+    """ Serialized size in bytes from which values are compressed, so small scalars stay uncompressed """
+
+    metrics_hook: Optional[StrictStr] = None
+    """ Dotted path of a callable(operation, phase, seconds, rows, bytes) receiving per-phase timings of every
+    online read and write, e.g. feast_teradata.online.metrics.REGISTRY (unset disables instrumentation) """
+
+    table_layout: Literal["narrow", "wide"] = "narrow"
+    """ narrow stores one row per entity and feature, wide stores one row per entity with a column per feature """
+
+    max_row_bytes: int = 65536
+    """ Maximum row length of the Teradata system (1048576 where 1 MB rows are enabled), checked for wide tables """
+
+    primary_index: Literal["unique", "non_unique"] = "non_unique"
+    """ Whether the primary index on the lookup key (entity_feature_key or entity_key) is declared UNIQUE """
+
+    entity_key_index: bool = False
+    """ Add a secondary index (NUSI) on entity_key to narrow tables """
+
+    fallback: Optional[bool] = None
+    """ (optional) Create online tables with FALLBACK or NO FALLBACK instead of the system default """
+
+    table_kind: Optional[Literal["set", "multiset"]] = None
+    """ (optional) Create online tables as SET or MULTISET instead of the session default """
+
+    block_compression: Optional[Literal["autotemp", "manual", "always", "never", "default"]] = None
+    """ (optional) BLOCKCOMPRESSION option of online tables """
+
+    multi_value_compression: bool = False
+    """ Compress feature names and NULL values with multi-value compression """
+
+    partition_event_ts: Optional[Literal["day", "month", "year"]] = None
+    """ (optional) Row partition online tables by event_ts with one partition per day, month or year """
+
+    partition_start: date = date(2000, 1, 1)
+    """ First date covered by the event_ts partitions """
+
+    partition_end: date = date(2099, 12, 31)
+    """ Last date covered by the event_ts partitions """
+
+    eviction_window_days: PositiveInt = 1
+    """ Days of event_ts deleted by each statement of evict_expired """
+
+    eviction_interval_seconds: Optional[int] = None
+    """ Evict expired rows of a feature view in the background after writing to it, at most this often (unset disables) """
+
+    @root_validator(skip_on_failure=True)
+    def _check_partitioned_primary_index(cls, values):
+        if values.get("partition_event_ts") and values.get("primary_index") == "unique":
+            raise ValueError(
+                "A unique primary index cannot be used with partition_event_ts because event_ts is not part of the "
+                "primary index; use primary_index: non_unique"
+            )
+        if values["partition_start"] > values["partition_end"]:
+            raise ValueError("partition_start must not be after partition_end")
+        return values
+
 
 class TeradataOnlineStore(OnlineStore):
 
+    def __init__(self):
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._executors_lock = threading.Lock()
+        self._cache: Optional[OnlineReadCache] = None
+        self._cache_lock = threading.Lock()
+        self._last_eviction: Dict[str, float] = {}
+        self._last_eviction_lock = threading.Lock()
+        self._metrics_hooks: Dict[str, MetricsHook] = {}
+
+    def _get_cache(self, config: RepoConfig) -> Optional[OnlineReadCache]:
+        online_config = config.online_store
+        if online_config.cache_max_size <= 0:
+            return None
+        with self._cache_lock:
+            if self._cache is None:
+                self._cache = OnlineReadCache(
+                    max_size=online_config.cache_max_size,
+                    ttl_seconds=online_config.cache_ttl_seconds,
+                    cache_missing=online_config.cache_missing,
+                )
+            return self._cache
+
+    def cache_stats(self) -> Dict[str, int]:
+        """
+        Size, hit, miss and eviction counters of the online read cache (all zero when it is disabled).
+        """
+        if self._cache is None:
+            return {"size": 0, "hits": 0, "misses": 0, "evictions": 0}
+        return self._cache.stats()
+
+    def _recorder(self, config: RepoConfig, operation: str):
+        """
+        Phase recorder of one call, or a shared no-op recorder when no metrics_hook is configured.
+        """
+        hook_path = config.online_store.metrics_hook
+        if hook_path is None:
+            return NULL_RECORDER
+        hook = self._metrics_hooks.get(hook_path)
+        if hook is None:
+            module_name, hook_name = hook_path.rsplit(".", 1)
+            hook = self._metrics_hooks[hook_path] = import_class(module_name, hook_name)
+        return PhaseRecorder(hook, operation)
+
+    def _get_executor(self, name: str, max_workers: int) -> ThreadPoolExecutor:
+        # Blocking Teradata calls run on bounded pools, so callers can keep several round trips
+        # in flight without opening an unbounded number of connections. Async calls and parallel
+        # read chunks use separate pools so an async read never waits on its own worker pool.
+        with self._executors_lock:
+            if name not in self._executors:
+                self._executors[name] = ThreadPoolExecutor(
+                    max_workers=max_workers,
+                    thread_name_prefix=f"feast-teradata-online-{name}",
+                )
+            return self._executors[name]
+
+    async def online_write_batch_async(
+            self,
+            config: RepoConfig,
+            table: FeatureView,
+            data: List[
+                Tuple[EntityKeyProto, Dict[str, ValueProto], datetime, Optional[datetime]]
+            ],
+            progress: Optional[Callable[[int], Any]],
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self._get_executor("async", config.online_store.async_max_workers),
+            self.online_write_batch,
+            config,
+            table,
+            data,
+            progress,
+        )
+
+    async def online_read_async(
+            self,
+            config: RepoConfig,
+            table: FeatureView,
+            entity_keys: List[EntityKeyProto],
+            requested_features: List[str],
+    ) -> List[Tuple[Optional[datetime], Optional[Dict[str, ValueProto]]]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor("async", config.online_store.async_max_workers),
+            self.online_read,
+            config,
+            table,
+            entity_keys,
+            requested_features,
+        )
+
     @log_exceptions_and_usage(online_store="teradata")
     def online_write_batch(
             self,
@@ -55,68 +264,176 @@ class TeradataOnlineStore(OnlineStore):
     ) -> None:
         assert isinstance(config.online_store, TeradataOnlineStoreConfig)
 
-        dfs = [None] * len(data)
-        for i, (entity_key, values, timestamp, created_ts) in enumerate(data):
-            df = pd.DataFrame(
-                columns=[
-                    "entity_feature_key",
-                    "entity_key",
-                    "feature_name",
-                    "value",
-                    "event_ts",
-                    "created_ts",
-                ],
-                index=range(0, len(values)),
-            )
-
-            timestamp = to_naive_utc(timestamp)
-            if created_ts is not None:
-                created_ts = to_naive_utc(created_ts)
-
-            for j, (feature_name, val) in enumerate(values.items()):
-                df.loc[j, "entity_feature_key"] = serialize_entity_key(
-                    entity_key,
-                    entity_key_serialization_version=config.entity_key_serialization_version,
-                ) + bytes(feature_name, encoding="utf-8")
-                df.loc[j, "entity_key"] = serialize_entity_key(
-                    entity_key,
-                    entity_key_serialization_version=config.entity_key_serialization_version,
+        chunk_size = config.online_store.write_chunk_size or max(len(data), 1)
+        cache = self._get_cache(config)
+        recorder = self._recorder(config, "online_write_batch")
+        for start in range(0, len(data), chunk_size):
+            chunk = data[start:start + chunk_size]
+            entity_key_bins = self._write_chunk(config, table, chunk, recorder)
+            if cache is not None:
+                table_id = _table_id(config.project, table)
+                cache.invalidate(
+                    (table_id, entity_key_bin, feature.name)
+                    for entity_key_bin in set(entity_key_bins)
+                    for feature in table.features
                 )
-                df.loc[j, "feature_name"] = feature_name
-                df.loc[j, "value"] = val.SerializeToString()
-                df.loc[j, "event_ts"] = timestamp
-                df.loc[j, "created_ts"] = created_ts
-
-            dfs[i] = df
-
-        if dfs:
-            agg_df = pd.concat(dfs)
-
-            # This combines both the data upload plus the overwrite in the same transaction
-            with get_conn(config.online_store).connect() as conn:
-                copy_to_sql(df=agg_df,
-                            table_name=f"{config.project}_{table.name}_t",
-                            if_exists="replace",
-                            types=types_dict,
-                            primary_index="entity_feature_key")
-
-                query = f"""
-                        MERGE INTO {config.project}_{table.name} tar
-                        USING {config.project}_{table.name}_t src
-                           ON tar.entity_feature_key=src.entity_feature_key AND tar.entity_key = src.entity_key AND tar.feature_name = src.feature_name 
-                        WHEN MATCHED THEN
-                           UPDATE SET "value" = src."value", event_ts = src.event_ts, created_ts = src.created_ts
-                        WHEN NOT MATCHED THEN
-                               INSERT (entity_feature_key, entity_key, feature_name, "value", event_ts, created_ts) 
-                                   VALUES (src.entity_feature_key, src.entity_key, src.feature_name, src."value", src.event_ts, src.created_ts)
-                        """
-                conn.execute(query)
-
             if progress:
-                progress(len(data))
+                progress(len(chunk))
+
+        if self._eviction_due(config, table):
+            # Eviction scans the table, so it runs on a background worker rather than inside the write
+            self._get_executor("evict", 1).submit(self._evict_in_background, config, table)
 
         return None
 
+    def _evict_in_background(self, config: RepoConfig, table: FeatureView):
+        try:
+            self.evict_expired(config, [table])
+        except Exception as e:
+            logger.warning("Background eviction of %s failed: %s", _table_id(config.project, table), e)
+
+    def _eviction_due(self, config: RepoConfig, table: FeatureView) -> bool:
+        interval = config.online_store.eviction_interval_seconds
+        if interval is None or not table.ttl:
+            return False
+        table_id = _table_id(config.project, table)
+        with self._last_eviction_lock:
+            now = time.monotonic()
+            last = self._last_eviction.get(table_id)
+            if last is not None and now - last < interval:
+                return False
+            self._last_eviction[table_id] = now
+            return True
+
+    @log_exceptions_and_usage(online_store="teradata")
+    def evict_expired(
+            self,
+            config: RepoConfig,
+            tables: Sequence[FeatureView],
+            now: Optional[datetime] = None,
+    ) -> Dict[str, Tuple[int, float]]:
+        """
+        Delete the rows of each feature view whose event_ts is older than the view's ttl.
+
+        Rows are deleted one eviction_window_days window of event_ts at a time, aligned to whole
+        days, so every DELETE stays bounded and only touches a few partitions of a table
+        partitioned by event_ts. Views without a ttl are skipped. Returns the number of rows
+        removed and the seconds taken for each online table.
+        """
+        assert isinstance(config.online_store, TeradataOnlineStoreConfig)
+
+        now = _to_naive_utc(now or datetime.utcnow())
+        window = timedelta(days=config.online_store.eviction_window_days)
+        report: Dict[str, Tuple[int, float]] = {}
+        for table in tables:
+            if not table.ttl:
+                continue
+            table_id = _table_id(config.project, table)
+            cutoff = now - table.ttl
+            start = time.monotonic()
+            removed = 0
+            with pooled_connection(config.online_store) as conn, conn.cursor() as cur:
+                cur.execute(f'SELECT MIN("event_ts") FROM "{table_id}" WHERE "event_ts" < ?', [cutoff])
+                oldest = cur.fetchone()[0]
+                while oldest is not None:
+                    lower = oldest.replace(hour=0, minute=0, second=0, microsecond=0)
+                    upper = min(lower + window, cutoff)
+                    cur.execute(
+                        f'DELETE FROM "{table_id}" WHERE "event_ts" >= ? AND "event_ts" < ?',
+                        [lower, upper],
+                    )
+                    removed += max(cur.rowcount, 0)
+                    # Skip over empty windows instead of stepping through them one by one
+                    cur.execute(
+                        f'SELECT MIN("event_ts") FROM "{table_id}" WHERE "event_ts" >= ? AND "event_ts" < ?',
+                        [upper, cutoff],
+                    )
+                    oldest = cur.fetchone()[0]
+            elapsed = time.monotonic() - start
+            cache = self._get_cache(config)
+            if cache is not None and removed:
+                # The evicted keys are not known here, so nothing cached for the table can be trusted
+                cache.invalidate_table(table_id)
+            logger.info("Evicted %d rows older than %s from %s in %.1fs", removed, cutoff, table_id, elapsed)
+            report[table_id] = (removed, elapsed)
+        return report
+
+    def _write_chunk(
+            self,
+            config: RepoConfig,
+            table: FeatureView,
+            data: List[
+                Tuple[EntityKeyProto, Dict[str, ValueProto], datetime, Optional[datetime]]
+            ],
+            recorder=NULL_RECORDER,
+    ) -> List[bytes]:
+        """
+        Build, stage and merge one chunk of rows, so memory is bounded by the chunk size.
+        Returns the serialized entity keys of the written rows.
+        """
+        online_config = config.online_store
+        table_columns = _table_columns(config, table)
+        key_column = _key_column(config)
+        with recorder.phase("build") as phase:
+            # Key serialization, deduplication and value encoding happen in this single pass
+            columns = _to_staging_columns(config, table, data)
+            n_rows = len(columns[key_column])
+            phase.rows = n_rows
+            phase.bytes = n_bytes = _columns_bytes(columns) if recorder.enabled else 0
+
+        if n_rows == 0:
+            return []
+        partitioned = online_config.partition_event_ts is not None
+        if n_rows <= online_config.direct_write_threshold and not partitioned:
+            # Small (push/stream) batches are upserted in one parameterized request with no DDL
+            merge_query = _merge_query(config, table, _values_source(table_columns))
+            with recorder.phase("merge") as phase, pooled_connection(online_config) as conn:
+                phase.rows, phase.bytes = n_rows, n_bytes
+                with conn.cursor() as cur:
+                    cur.executemany(merge_query, list(zip(*columns.values())))
+        else:
+            # Every call stages into its own uniquely named table so concurrent writers
+            # on the same feature view never overwrite each other's rows
+            staging_table = _staging_table_name(config.project, table)
+            if partitioned:
+                apply_query = _replace_query(config, table, staging_table)
+            else:
+                apply_query = _merge_query(config, table, f"{staging_table} src")
+            # Staged rows older than the stored ones are dropped first, so backfills and replayed
+            # streams do not rewrite rows they would leave unchanged
+            merge_query = ";".join([_prune_stale_query(config, table, staging_table), apply_query])
+            if online_config.write_method == "copy_to_sql":
+                get_teradataml_context(online_config)
+                with get_conn(online_config).connect() as conn:
+                    try:
+                        with recorder.phase("upload") as phase:
+                            phase.rows, phase.bytes = n_rows, n_bytes
+                            copy_to_sql(df=pd.DataFrame(columns, columns=list(table_columns)),
+                                        table_name=staging_table,
+                                        if_exists="replace",
+                                        types=_copy_to_sql_types(config, table),
+                                        primary_index=key_column)
+                        with recorder.phase("merge") as phase:
+                            phase.rows = n_rows
+                            conn.execute(merge_query)
+                    finally:
+                        _drop_staging_table(conn, staging_table)
+            else:
+                with pooled_connection(online_config) as conn:
+                    with conn.cursor() as cur:
+                        cur.execute(_staging_table_ddl(staging_table, table_columns, key_column))
+                        try:
+                            with recorder.phase("upload") as phase:
+                                phase.rows, phase.bytes = n_rows, n_bytes
+                                _bulk_insert(conn, cur, staging_table, columns, online_config)
+                            with recorder.phase("merge") as phase:
+                                phase.rows = n_rows
+                                cur.execute(merge_query)
+                        finally:
+                            _drop_staging_table(cur, staging_table)
+
+        return columns["entity_key"]
+
     @log_exceptions_and_usage(online_store="teradata")
     def online_read(
             self,
@@ -127,54 +444,202 @@ class TeradataOnlineStore(OnlineStore):
     ) -> List[Tuple[Optional[datetime], Optional[Dict[str, ValueProto]]]]:
         assert isinstance(config.online_store, TeradataOnlineStoreConfig)
 
-        result: List[Tuple[Optional[datetime], Optional[Dict[str, ValueProto]]]] = []
-
-        entity_fetch_str = ",".join(
-            [
-                (
-                        "TO_BYTES("
-                        + hexlify(
-                            serialize_entity_key(
-                                combo[0],
-                                entity_key_serialization_version=config.entity_key_serialization_version,
-                            )
-                            + bytes(combo[1], encoding="utf-8")
-                        ).__str__()[1:]
-                        + ",'base16')"
+        recorder = self._recorder(config, "online_read")
+        with recorder.phase("serialize") as phase:
+            phase.rows = len(entity_keys)
+            entity_key_bins = [
+                serialize_entity_key(
+                    entity_key,
+                    entity_key_serialization_version=config.entity_key_serialization_version,
                 )
-                for combo in itertools.product(entity_keys, requested_features)
+                for entity_key in entity_keys
             ]
-        )
 
-        with get_conn(config.online_store).connect() as conn:
-            query = f"""
-                    SELECT
-                        "entity_key", "feature_name", "value", "event_ts"
-                    FROM
-                        "{config.project}_{table.name}"
-                    WHERE
-                        "entity_feature_key" IN ({entity_fetch_str})
-                """
-            df = DataFrame.from_query(query).to_pandas()
-
-        for entity_key in entity_keys:
-            entity_key_bin = serialize_entity_key(
-                entity_key,
-                entity_key_serialization_version=config.entity_key_serialization_version,
+        cache = self._get_cache(config)
+        if cache is None:
+            rows_by_entity = self._fetch_entities(config, table, entity_key_bins, requested_features, recorder)
+        else:
+            rows_by_entity = self._fetch_entities_cached(
+                cache, config, table, entity_key_bins, requested_features, recorder
             )
-            res = {}
-            res_ts = None
-            for index, row in df[df["entity_key"] == entity_key_bin].iterrows():
-                val = ValueProto()
-                val.ParseFromString(row["value"])
-                res[row["feature_name"]] = val
-                res_ts = row["event_ts"].to_pydatetime()
-
-            if not res:
-                result.append((None, None))
-            else:
-                result.append((res_ts, res))
-        return result
+        return [rows_by_entity.get(entity_key_bin, (None, None)) for entity_key_bin in entity_key_bins]
+
+    @log_exceptions_and_usage(online_store="teradata")
+    def online_read_many(
+            self,
+            config: RepoConfig,
+            reads: Sequence[Tuple[FeatureView, List[EntityKeyProto], List[str]]],
+    ) -> List[List[Tuple[Optional[datetime], Optional[Dict[str, ValueProto]]]]]:
+        """
+        Read several feature views, e.g. all the views of a feature service, in one round trip.
+
+        Each read is a (feature view, entity keys, requested features) triple and gets the same
+        result as online_read would return for it. The lookups of all the views are sent together
+        as one multi-statement request, so serving latency no longer grows with the number of views.
+        """
+        assert isinstance(config.online_store, TeradataOnlineStoreConfig)
+
+        recorder = self._recorder(config, "online_read_many")
+        with recorder.phase("serialize") as phase:
+            entity_key_bins_per_read = [
+                [
+                    serialize_entity_key(
+                        entity_key,
+                        entity_key_serialization_version=config.entity_key_serialization_version,
+                    )
+                    for entity_key in entity_keys
+                ]
+                for _, entity_keys, _ in reads
+            ]
+            phase.rows = sum(len(entity_key_bins) for entity_key_bins in entity_key_bins_per_read)
+
+        cache = self._get_cache(config)
+        if cache is None:
+            rows_by_entity_per_read = self._fetch_many(
+                config,
+                [
+                    (table, entity_key_bins, requested_features)
+                    for (table, _, requested_features), entity_key_bins in zip(reads, entity_key_bins_per_read)
+                ],
+                recorder,
+            )
+        else:
+            with recorder.phase("cache") as phase:
+                looked_up = [
+                    _cache_lookup(cache, _table_id(config.project, table), entity_key_bins, requested_features)
+                    for (table, _, requested_features), entity_key_bins in zip(reads, entity_key_bins_per_read)
+                ]
+                phase.rows = sum(len(rows_by_entity) for rows_by_entity, _, _ in looked_up)
+            fetched_per_read = self._fetch_many(
+                config,
+                [
+                    (table, to_fetch, requested_features)
+                    for (table, _, requested_features), (_, to_fetch, _) in zip(reads, looked_up)
+                ],
+                recorder,
+            )
+            rows_by_entity_per_read = []
+            for (table, _, requested_features), (rows_by_entity, to_fetch, generation), fetched in zip(
+                    reads, looked_up, fetched_per_read
+            ):
+                _cache_store(
+                    cache, _table_id(config.project, table), generation, to_fetch, requested_features, fetched
+                )
+                rows_by_entity.update(fetched)
+                rows_by_entity_per_read.append(rows_by_entity)
+
+        return [
+            [rows_by_entity.get(entity_key_bin, (None, None)) for entity_key_bin in entity_key_bins]
+            for rows_by_entity, entity_key_bins in zip(rows_by_entity_per_read, entity_key_bins_per_read)
+        ]
+
+    def _fetch_entities(
+            self,
+            config: RepoConfig,
+            table: FeatureView,
+            entity_key_bins: List[bytes],
+            requested_features: List[str],
+            recorder=NULL_RECORDER,
+    ) -> Dict[bytes, Tuple[datetime, Dict[str, ValueProto]]]:
+        return self._fetch_many(config, [(table, entity_key_bins, requested_features)], recorder)[0]
+
+    def _fetch_many(
+            self,
+            config: RepoConfig,
+            reads: Sequence[Tuple[FeatureView, List[bytes], List[str]]],
+            recorder=NULL_RECORDER,
+    ) -> List[Dict[bytes, Tuple[datetime, Dict[str, ValueProto]]]]:
+        plans = [
+            _read_plan(config, table, entity_key_bins, requested_features)
+            if entity_key_bins and requested_features else None
+            for table, entity_key_bins, requested_features in reads
+        ]
+        with recorder.phase("query") as phase:
+            rows_per_plan = self._read_in_chunks(config, [plan[:2] for plan in plans if plan])
+            if recorder.enabled:
+                phase.rows = sum(len(rows) for rows in rows_per_plan)
+                phase.bytes = sum(_rows_bytes(rows) for rows in rows_per_plan)
+        with recorder.phase("decode") as phase:
+            rows_iter = iter(rows_per_plan)
+            rows_by_entity_per_read = [plan[2](next(rows_iter)) if plan else {} for plan in plans]
+            phase.rows = sum(len(rows_by_entity) for rows_by_entity in rows_by_entity_per_read)
+        return rows_by_entity_per_read
+
+    def _fetch_entities_cached(
+            self,
+            cache: OnlineReadCache,
+            config: RepoConfig,
+            table: FeatureView,
+            entity_key_bins: List[bytes],
+            requested_features: List[str],
+            recorder=NULL_RECORDER,
+    ) -> Dict[bytes, Tuple[datetime, Dict[str, ValueProto]]]:
+        """
+        Serve what the cache holds and fetch every entity with at least one uncached feature.
+        """
+        table_id = _table_id(config.project, table)
+        with recorder.phase("cache") as phase:
+            rows_by_entity, to_fetch, generation = _cache_lookup(
+                cache, table_id, entity_key_bins, requested_features
+            )
+            phase.rows = len(rows_by_entity)
+        fetched = self._fetch_entities(config, table, to_fetch, requested_features, recorder)
+        _cache_store(cache, table_id, generation, to_fetch, requested_features, fetched)
+        rows_by_entity.update(fetched)
+        return rows_by_entity
+
+    def _read_in_chunks(
+            self,
+            config: RepoConfig,
+            statements: List[Tuple[Callable[[int], str], List[bytes]]],
+    ) -> List[List[Tuple]]:
+        """
+        Run every (query, keys) statement with its keys bound as parameters, read_chunk_size keys
+        at a time, and return the rows of each statement. The statement text only depends on the
+        number of keys, and every chunk is padded up to one of the read_key_buckets sizes by
+        repeating its last key, so requests of any size reuse the same few statements and
+        Teradata's request cache can reuse their plans. Chunks of different statements are packed
+        into multi-statement requests of up to read_chunk_size keys, and multiple requests are
+        fetched in parallel. Rows are fetched as plain tuples from a teradatasql cursor.
+        """
+        chunk_size = config.online_store.read_chunk_size
+        requests: List[List[Tuple[int, str, List[bytes]]]] = []
+        n_request_keys = 0
+        for i, (query, keys) in enumerate(statements):
+            for j in range(0, len(keys), chunk_size):
+                chunk = keys[j:j + chunk_size]
+                # A repeated key matches the same row again, and IN returns every row once
+                n_keys = _bucket_size(len(chunk), config.online_store)
+                chunk += chunk[-1:] * (n_keys - len(chunk))
+                if not requests or n_request_keys + n_keys > chunk_size:
+                    requests.append([])
+                    n_request_keys = 0
+                requests[-1].append((i, query(n_keys), chunk))
+                n_request_keys += n_keys
+
+        def fetch(request: List[Tuple[int, str, List[bytes]]]) -> List[List[Tuple]]:
+            with pooled_connection(config.online_store) as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        ";".join(sql for _, sql, _ in request),
+                        [key for _, _, chunk in request for key in chunk],
+                    )
+                    results = [cur.fetchall()]
+                    while len(results) < len(request) and cur.nextset():
+                        results.append(cur.fetchall())
+                    return results
+
+        if len(requests) <= 1:
+            results_per_request = [fetch(request) for request in requests]
+        else:
+            executor = self._get_executor("read", config.online_store.read_max_workers)
+            results_per_request = list(executor.map(fetch, requests))
+
+        rows_per_statement: List[List[Tuple]] = [[] for _ in statements]
+        for request, results in zip(requests, results_per_request):
+            for (i, _, _), rows in zip(request, results):
+                rows_per_statement[i].extend(rows)
+        return rows_per_statement
 
     @log_exceptions_and_usage(online_store="teradata")
     def update(
@@ -188,19 +653,13 @@ class TeradataOnlineStore(OnlineStore):
     ):
         assert isinstance(config.online_store, TeradataOnlineStoreConfig)
 
+        if config.online_store.table_layout == "wide":
+            for table in tables_to_keep:
+                _check_wide_columns(config, table)
+
         with get_conn(config.online_store).connect() as conn:
             for table in tables_to_keep:
-                query = f"""
-                        CREATE TABLE {config.project}_{table.name} (
-                            "entity_feature_key" VARBYTE(512),
-                            "entity_key" VARBYTE(512),
-                            "feature_name" VARCHAR(512),
-                            "value" VARBYTE(1024),
-                            "event_ts" TIMESTAMP,
-                            "created_ts" TIMESTAMP
-                        )
-                    """
-                conn.execute(query)
+                conn.execute(_create_table_ddl(config, table))
 
             for table in tables_to_delete:
                 query = f"""DROP TABLE {config.project}_{table.name}"""
@@ -220,6 +679,594 @@ class TeradataOnlineStore(OnlineStore):
                 conn.execute(query)
 
 
+def _key_column(config: RepoConfig) -> str:
+    if config.online_store.table_layout == "wide":
+        return "entity_key"
+    return "entity_feature_key"
+
+
+def _table_columns(config: RepoConfig, table: FeatureView) -> Dict[str, str]:
+    """
+    Column names and Teradata types of the online table. The wide layout stores every feature of the
+    view in its own column holding the serialized ValueProto.
+    """
+    if config.online_store.table_layout == "wide":
+        columns = {"entity_key": "VARBYTE(512)"}
+        for feature in table.features:
+            columns[feature.name] = "VARBYTE(1024)"
+        columns["event_ts"] = "TIMESTAMP"
+        columns["created_ts"] = "TIMESTAMP"
+        return columns
+    return NARROW_COLUMNS
+
+
+WIDE_FEATURE_BYTES = 1024 + 2
+""" Largest stored size of a VARBYTE(1024) feature column, including its length field """
+
+ROW_OVERHEAD_BYTES = 64
+""" Allowance for the row header, row id and presence bits of a Teradata row """
+
+
+def _check_wide_columns(config: RepoConfig, table: FeatureView):
+    """
+    Reject feature views whose wide table cannot be created: a feature column named like one of the
+    fixed columns, or like another feature up to case (Teradata column names are case-insensitive),
+    would overwrite it, and every row must fit in max_row_bytes.
+    """
+    seen: Dict[str, str] = {name.lower(): name for name in ("entity_key", "event_ts", "created_ts")}
+    for feature in table.features:
+        clash = seen.get(feature.name.lower())
+        if clash is not None:
+            raise ValueError(
+                f"Feature {feature.name} of feature view {table.name} clashes with column {clash} of the "
+                f"wide online table (column names are case-insensitive); rename the feature or use table_layout: narrow"
+            )
+        seen[feature.name.lower()] = feature.name
+
+    max_row_bytes = config.online_store.max_row_bytes
+    row_bytes = _max_row_bytes(_table_columns(config, table))
+    if row_bytes > max_row_bytes:
+        fixed_bytes = row_bytes - len(table.features) * WIDE_FEATURE_BYTES
+        raise ValueError(
+            f"The wide online table of feature view {table.name} needs rows of up to {row_bytes} bytes, more than "
+            f"max_row_bytes ({max_row_bytes}); at most {(max_row_bytes - fixed_bytes) // WIDE_FEATURE_BYTES} "
+            f"features fit, so split the feature view or use table_layout: narrow"
+        )
+
+
+def _max_row_bytes(columns: Dict[str, str]) -> int:
+    """
+    Largest possible length of a row of the VARBYTE and TIMESTAMP columns of an online table.
+    """
+    row_bytes = ROW_OVERHEAD_BYTES
+    for sql_type in columns.values():
+        if sql_type.startswith("VARBYTE("):
+            row_bytes += int(sql_type[len("VARBYTE("):-1]) + 2
+        elif sql_type.startswith("VARCHAR("):
+            row_bytes += 2 * int(sql_type[len("VARCHAR("):-1]) + 2
+        else:
+            row_bytes += 10
+    return row_bytes
+
+
+def _copy_to_sql_types(config: RepoConfig, table: FeatureView) -> Dict[str, Any]:
+    if config.online_store.table_layout == "wide":
+        types = {"entity_key": VARBYTE(512)}
+        for feature in table.features:
+            types[feature.name] = VARBYTE(1024)
+        types["event_ts"] = TIMESTAMP
+        types["created_ts"] = TIMESTAMP
+        return types
+    return types_dict
+
+
+def _to_staging_columns(
+        config: RepoConfig,
+        table: FeatureView,
+        data: List[
+            Tuple[EntityKeyProto, Dict[str, ValueProto], datetime, Optional[datetime]]
+        ],
+) -> Dict[str, List[Any]]:
+    if config.online_store.table_layout == "wide":
+        return _to_wide_columns(config, table, data)
+    return _to_narrow_columns(config, data)
+
+
+def _to_narrow_columns(
+        config: RepoConfig,
+        data: List[
+            Tuple[EntityKeyProto, Dict[str, ValueProto], datetime, Optional[datetime]]
+        ],
+) -> Dict[str, List[Any]]:
+    """
+    Build the staging rows (one per entity and feature) in a single columnar pass.
+    Each entity key is serialized only once and every column is a preallocated list.
+    A key written more than once keeps only its newest (event_ts, created_ts) row, the first of equally new ones.
+    """
+    n_rows = sum(len(values) for _, values, _, _ in data)
+    columns: Dict[str, List[Any]] = {name: [None] * n_rows for name in NARROW_COLUMNS}
+    entity_feature_keys = columns["entity_feature_key"]
+    entity_key_bins = columns["entity_key"]
+    feature_names = columns["feature_name"]
+    feature_values = columns["value"]
+    event_timestamps = columns["event_ts"]
+    created_timestamps = columns["created_ts"]
+    encode = _value_encoder(config)
+
+    row_of_key: Dict[bytes, int] = {}
+    i = 0
+    for entity_key, values, timestamp, created_ts in data:
+        entity_key_bin = serialize_entity_key(
+            entity_key,
+            entity_key_serialization_version=config.entity_key_serialization_version,
+        )
+        timestamp = to_naive_utc(timestamp)
+        if created_ts is not None:
+            created_ts = to_naive_utc(created_ts)
+
+        for feature_name, val in values.items():
+            entity_feature_key = entity_key_bin + bytes(feature_name, encoding="utf-8")
+            j = row_of_key.get(entity_feature_key)
+            if j is None:
+                j = row_of_key[entity_feature_key] = i
+                i += 1
+            elif not _is_newer(timestamp, created_ts, event_timestamps[j], created_timestamps[j]):
+                continue
+            entity_feature_keys[j] = entity_feature_key
+            entity_key_bins[j] = entity_key_bin
+            feature_names[j] = feature_name
+            feature_values[j] = encode(val)
+            event_timestamps[j] = timestamp
+            created_timestamps[j] = created_ts
+
+    return _truncate_columns(columns, i)
+
+
+def _to_wide_columns(
+        config: RepoConfig,
+        table: FeatureView,
+        data: List[
+            Tuple[EntityKeyProto, Dict[str, ValueProto], datetime, Optional[datetime]]
+        ],
+) -> Dict[str, List[Any]]:
+    """
+    Build the staging rows for the wide layout: one row per entity, with a NULL for every feature
+    missing from the written values. An entity written more than once keeps only its newest write
+    (the first of equally new ones). Features missing from it stay NULL rather than being filled from
+    older writes, so the MERGE keeps their stored values instead of overwriting them with older ones.
+    """
+    n_rows = len(data)
+    columns: Dict[str, List[Any]] = {
+        name: [None] * n_rows for name in _table_columns(config, table)
+    }
+    entity_key_bins = columns["entity_key"]
+    event_timestamps = columns["event_ts"]
+    created_timestamps = columns["created_ts"]
+    encode = _value_encoder(config)
+
+    row_of_key: Dict[bytes, int] = {}
+    i = 0
+    for entity_key, values, timestamp, created_ts in data:
+        entity_key_bin = serialize_entity_key(
+            entity_key,
+            entity_key_serialization_version=config.entity_key_serialization_version,
+        )
+        timestamp = to_naive_utc(timestamp)
+        if created_ts is not None:
+            created_ts = to_naive_utc(created_ts)
+
+        j = row_of_key.get(entity_key_bin)
+        if j is None:
+            j = row_of_key[entity_key_bin] = i
+            i += 1
+        elif _is_newer(timestamp, created_ts, event_timestamps[j], created_timestamps[j]):
+            for feature in table.features:
+                columns[feature.name][j] = None
+        else:
+            continue
+        for feature_name, val in values.items():
+            columns[feature_name][j] = encode(val)
+        entity_key_bins[j] = entity_key_bin
+        event_timestamps[j] = timestamp
+        created_timestamps[j] = created_ts
+
+    return _truncate_columns(columns, i)
+
+
+def _value_encoder(config: RepoConfig) -> Callable[[ValueProto], bytes]:
+    return value_encoder(
+        config.online_store.value_compression,
+        config.online_store.value_compression_threshold,
+    )
+
+
+def _columns_bytes(columns: Dict[str, List[Any]]) -> int:
+    return sum(len(value) for values in columns.values() for value in values if isinstance(value, bytes))
+
+
+def _rows_bytes(rows: Iterable[Tuple]) -> int:
+    return sum(len(value) for row in rows for value in row if isinstance(value, bytes))
+
+
+def _is_newer(
+        event_ts: datetime,
+        created_ts: Optional[datetime],
+        other_event_ts: datetime,
+        other_created_ts: Optional[datetime],
+) -> bool:
+    """
+    Whether a row is newer than another one by (event_ts, created_ts). Of two equally new rows the one
+    seen first is kept, the same way the MERGE keeps a stored row against an equally new write.
+    """
+    return (event_ts, created_ts or datetime.min) > (other_event_ts, other_created_ts or datetime.min)
+
+
+def _truncate_columns(columns: Dict[str, List[Any]], n_rows: int) -> Dict[str, List[Any]]:
+    for values in columns.values():
+        del values[n_rows:]
+    return columns
+
+
+def _merge_query(config: RepoConfig, table: FeatureView, source: str) -> str:
+    """
+    MERGE the rows of source (a staging table or a VALUES row aliased as src) into the online table.
+    A matched row only takes the source values when the source row is newer than the stored one.
+    """
+    newer = _source_is_newer("src", "tar")
+    if config.online_store.table_layout == "wide":
+        feature_names = [feature.name for feature in table.features]
+        # Features missing from a write keep their stored value instead of being reset to NULL
+        update_features = "".join(
+            f'"{name}" = CASE WHEN {newer} THEN COALESCE(src."{name}", tar."{name}") ELSE tar."{name}" END, '
+            for name in feature_names
+        )
+        insert_columns = ", ".join(f'"{name}"' for name in _table_columns(config, table))
+        insert_values = ", ".join(f'src."{name}"' for name in _table_columns(config, table))
+        return f"""
+            MERGE INTO {_table_id(config.project, table)} tar
+            USING {source}
+               ON tar.entity_key = src.entity_key
+            WHEN MATCHED THEN
+               UPDATE SET {update_features}
+                          event_ts = CASE WHEN {newer} THEN src.event_ts ELSE tar.event_ts END,
+                          created_ts = CASE WHEN {newer} THEN src.created_ts ELSE tar.created_ts END
+            WHEN NOT MATCHED THEN
+                   INSERT ({insert_columns})
+                       VALUES ({insert_values})
+            """
+
+    return f"""
+        MERGE INTO {_table_id(config.project, table)} tar
+        USING {source}
+           ON tar.entity_feature_key=src.entity_feature_key AND tar.entity_key = src.entity_key AND tar.feature_name = src.feature_name 
+        WHEN MATCHED THEN
+           UPDATE SET "value" = CASE WHEN {newer} THEN src."value" ELSE tar."value" END,
+                      event_ts = CASE WHEN {newer} THEN src.event_ts ELSE tar.event_ts END,
+                      created_ts = CASE WHEN {newer} THEN src.created_ts ELSE tar.created_ts END
+        WHEN NOT MATCHED THEN
+               INSERT (entity_feature_key, entity_key, feature_name, "value", event_ts, created_ts) 
+                   VALUES (src.entity_feature_key, src.entity_key, src.feature_name, src."value", src.event_ts, src.created_ts)
+        """
+
+
+def _replace_query(config: RepoConfig, table: FeatureView, staging_table: str) -> str:
+    """
+    Teradata only allows MERGE into a row partitioned table when the ON clause covers the partitioning
+    column, which an upsert by key cannot do. Partitioned tables are therefore written by deleting the
+    staged keys and inserting the staged rows, in one multi-statement (and so atomic) request.
+    """
+    target = _table_id(config.project, table)
+    key_column = _key_column(config)
+    column_list = ", ".join(f'"{name}"' for name in _table_columns(config, table))
+    statements = []
+    if config.online_store.table_layout == "wide":
+        # Features missing from a write keep their stored value, as in the MERGE
+        set_features = ", ".join(
+            f'"{feature.name}" = COALESCE(src."{feature.name}", tar."{feature.name}")'
+            for feature in table.features
+        )
+        statements.append(
+            f"""UPDATE src FROM {staging_table} AS src, {target} AS tar
+                SET {set_features}
+                WHERE src."entity_key" = tar."entity_key"
+            """
+        )
+    statements.append(
+        f"""DELETE FROM {target}
+            WHERE "{key_column}" IN (SELECT "{key_column}" FROM {staging_table})
+        """
+    )
+    statements.append(
+        f"""INSERT INTO {target} ({column_list})
+            SELECT {column_list} FROM {staging_table}
+        """
+    )
+    return ";".join(statements)
+
+
+def _prune_stale_query(config: RepoConfig, table: FeatureView, staging_table: str) -> str:
+    """
+    Delete the staged rows that are not newer than the stored ones, so they are neither merged nor replaced.
+    """
+    key_column = _key_column(config)
+    return f"""DELETE src FROM {staging_table} AS src, {_table_id(config.project, table)} AS tar
+        WHERE src."{key_column}" = tar."{key_column}" AND NOT {_source_is_newer("src", "tar")}
+    """
+
+
+def _source_is_newer(src: str, tar: str) -> str:
+    # Same ordering as _is_newer, so ties keep the stored row
+    return (
+        f"({src}.event_ts > {tar}.event_ts OR ({src}.event_ts = {tar}.event_ts AND "
+        f"COALESCE({src}.created_ts, TIMESTAMP '0001-01-01 00:00:00') > "
+        f"COALESCE({tar}.created_ts, TIMESTAMP '0001-01-01 00:00:00')))"
+    )
+
+
+def _values_source(table_columns: Dict[str, str]) -> str:
+    markers = ", ".join(f"CAST(? AS {sql_type})" for sql_type in table_columns.values())
+    column_list = ", ".join(f'"{name}"' for name in table_columns)
+    return f"VALUES ({markers}) AS src ({column_list})"
+
+
+def _staging_table_ddl(staging_table: str, table_columns: Dict[str, str], key_column: str) -> str:
+    column_defs = ",\n".join(f'"{name}" {sql_type}' for name, sql_type in table_columns.items())
+    return f"""
+        CREATE MULTISET TABLE {staging_table}, NO FALLBACK (
+            {column_defs}
+        ) PRIMARY INDEX ("{key_column}")
+        """
+
+
+def _read_plan(
+        config: RepoConfig,
+        table: FeatureView,
+        entity_key_bins: List[bytes],
+        requested_features: List[str],
+) -> Tuple[Callable[[int], str], List[bytes], Callable[[Iterable[Tuple]], Dict[bytes, Tuple[datetime, Dict[str, ValueProto]]]]]:
+    """
+    Build the lookup of a feature view as (query for n keys, keys to bind, grouping of the fetched rows).
+    """
+    table_id = _table_id(config.project, table)
+    if config.online_store.table_layout == "wide":
+        query = functools.partial(_select_statement, table_id, "wide", tuple(requested_features))
+        return query, entity_key_bins, lambda rows: _group_wide_rows(rows, requested_features)
+
+    entity_feature_keys = [
+        entity_key_bin + bytes(feature_name, encoding="utf-8")
+        for entity_key_bin, feature_name in itertools.product(entity_key_bins, requested_features)
+    ]
+    query = functools.partial(_select_statement, table_id, "narrow", ())
+    return query, entity_feature_keys, _group_narrow_rows
+
+
+@functools.lru_cache(maxsize=1024)
+def _select_statement(table_id: str, table_layout: str, requested_features: Tuple[str, ...], n_keys: int) -> str:
+    """
+    SELECT text of an online lookup of n_keys keys. Lookups are padded to a few bucketed key counts,
+    so a handful of texts serve every request and are only built once.
+    """
+    if table_layout == "wide":
+        feature_columns = "".join(f', "{feature_name}"' for feature_name in requested_features)
+        return f"""
+                SELECT
+                    "entity_key", "event_ts"{feature_columns}
+                FROM
+                    "{table_id}"
+                WHERE
+                    "entity_key" IN ({_param_markers(n_keys)})
+            """
+
+    return f"""
+            SELECT
+                "entity_key", "feature_name", "value", "event_ts"
+            FROM
+                "{table_id}"
+            WHERE
+                "entity_feature_key" IN ({_param_markers(n_keys)})
+        """
+
+
+def _cache_lookup(
+        cache: OnlineReadCache,
+        table_id: str,
+        entity_key_bins: List[bytes],
+        requested_features: List[str],
+) -> Tuple[Dict[bytes, Tuple[datetime, Dict[str, ValueProto]]], List[bytes], int]:
+    """
+    Return the entities fully served by the cache, the entities with at least one uncached feature, and
+    the cache generation of the table, taken before the lookup so _cache_store can tell whether a write
+    invalidated the table while the uncached entities were read.
+    """
+    generation = cache.generation(table_id)
+    rows_by_entity: Dict[bytes, Tuple[datetime, Dict[str, ValueProto]]] = {}
+    to_fetch: List[bytes] = []
+    for entity_key_bin in dict.fromkeys(entity_key_bins):
+        cached = [
+            cache.get((table_id, entity_key_bin, feature_name))
+            for feature_name in requested_features
+        ]
+        if any(entry is None for entry in cached):
+            to_fetch.append(entity_key_bin)
+            continue
+        res = {}
+        res_ts = None
+        for feature_name, entry in zip(requested_features, cached):
+            if entry is not MISSING:
+                res_ts = entry[0] if res_ts is None else max(res_ts, entry[0])
+                res[feature_name] = entry[1]
+        if res:
+            rows_by_entity[entity_key_bin] = (res_ts, res)
+    return rows_by_entity, to_fetch, generation
+
+
+def _cache_store(
+        cache: OnlineReadCache,
+        table_id: str,
+        generation: int,
+        fetched_keys: List[bytes],
+        requested_features: List[str],
+        fetched: Dict[bytes, Tuple[datetime, Dict[str, ValueProto]]],
+):
+    """
+    Cache the fetched values, unless a write invalidated the table after generation was taken:
+    they may have been read before that write and would be served stale until they expire.
+    """
+    for entity_key_bin in fetched_keys:
+        res_ts, res = fetched.get(entity_key_bin, (None, {}))
+        for feature_name in requested_features:
+            key = (table_id, entity_key_bin, feature_name)
+            if feature_name in res:
+                cache.put(key, (res_ts, res[feature_name]), generation)
+            else:
+                cache.put_missing(key, generation)
+
+
+def _group_narrow_rows(
+        rows: Iterable[Tuple],
+) -> Dict[bytes, Tuple[datetime, Dict[str, ValueProto]]]:
+    """
+    Group the fetched (entity_key, feature_name, value, event_ts) rows by serialized entity key in one pass.
+    """
+    rows_by_entity: Dict[bytes, Tuple[datetime, Dict[str, ValueProto]]] = {}
+    for entity_key_bin, feature_name, value, event_ts in rows:
+        val = ValueProto()
+        val.ParseFromString(decode_value(value))
+        entry = rows_by_entity.get(entity_key_bin)
+        res = entry[1] if entry else {}
+        res[feature_name] = val
+        rows_by_entity[entity_key_bin] = (event_ts, res)
+    return rows_by_entity
+
+
+def _group_wide_rows(
+        rows: Iterable[Tuple],
+        requested_features: List[str],
+) -> Dict[bytes, Tuple[datetime, Dict[str, ValueProto]]]:
+    """
+    Group the fetched (entity_key, event_ts, *feature values) rows by serialized entity key.
+    """
+    rows_by_entity: Dict[bytes, Tuple[datetime, Dict[str, ValueProto]]] = {}
+    for entity_key_bin, event_ts, *values in rows:
+        res = {}
+        for feature_name, value in zip(requested_features, values):
+            if value is None:
+                continue
+            val = ValueProto()
+            val.ParseFromString(decode_value(value))
+            res[feature_name] = val
+        if res:
+            rows_by_entity[entity_key_bin] = (event_ts, res)
+    return rows_by_entity
+
+
+def _bucket_size(n_keys: int, online_config: TeradataOnlineStoreConfig) -> int:
+    """
+    Smallest of the read_key_buckets sizes that holds n_keys, or read_chunk_size above the largest one.
+    """
+    if not online_config.read_key_buckets:
+        return n_keys
+    for bucket in sorted(online_config.read_key_buckets):
+        if n_keys <= bucket:
+            return bucket
+    return max(n_keys, online_config.read_chunk_size)
+
+
+def _param_markers(n: int) -> str:
+    return ", ".join("?" for _ in range(n))
+
+
+def _bulk_insert(
+        conn,
+        cur,
+        staging_table: str,
+        columns: Dict[str, List[Any]],
+        online_config: TeradataOnlineStoreConfig,
+):
+    """
+    Upload the staging rows with batched parameterized inserts, or with FastLoad for the fastload write method.
+    """
+    bulk_insert(
+        conn,
+        cur,
+        staging_table,
+        list(columns),
+        zip(*columns.values()),
+        online_config.write_batch_size,
+        fastload=online_config.write_method == "fastload",
+    )
+
+
+def _create_table_ddl(config: RepoConfig, table: FeatureView) -> str:
+    """
+    CREATE TABLE statement of an online table, including the physical design options of the online store config.
+    """
+    online_config = config.online_store
+    table_kind = f"{online_config.table_kind.upper()} " if online_config.table_kind else ""
+    table_options = ""
+    if online_config.fallback is not None:
+        table_options += ", FALLBACK" if online_config.fallback else ", NO FALLBACK"
+    if online_config.block_compression:
+        table_options += f", BLOCKCOMPRESSION = {online_config.block_compression.upper()}"
+
+    compression = _column_compression(config, table)
+    column_defs = ",\n".join(
+        f'"{name}" {sql_type}{compression.get(name, "")}'
+        for name, sql_type in _table_columns(config, table).items()
+    )
+
+    unique = "UNIQUE " if online_config.primary_index == "unique" else ""
+    indexes = f'{unique}PRIMARY INDEX ("{_key_column(config)}")'
+    if online_config.partition_event_ts:
+        indexes += f"\n{_event_ts_partitioning(online_config)}"
+    if online_config.entity_key_index and online_config.table_layout == "narrow":
+        indexes += '\nINDEX ("entity_key")'
+
+    return f"""
+        CREATE {table_kind}TABLE {_table_id(config.project, table)}{table_options} (
+            {column_defs}
+        ) {indexes}
+        """
+
+
+def _column_compression(config: RepoConfig, table: FeatureView) -> Dict[str, str]:
+    if not config.online_store.multi_value_compression:
+        return {}
+    # NULL compression on every nullable payload column, plus the known feature names in the narrow layout
+    compression = {"created_ts": " COMPRESS"}
+    if config.online_store.table_layout == "wide":
+        for feature in table.features:
+            compression[feature.name] = " COMPRESS"
+    else:
+        feature_names = ", ".join(
+            "'" + feature.name.replace("'", "''") + "'" for feature in table.features[:255]
+        )
+        if feature_names:
+            compression["feature_name"] = f" COMPRESS ({feature_names})"
+    return compression
+
+
+def _event_ts_partitioning(online_config: TeradataOnlineStoreConfig) -> str:
+    return (
+        'PARTITION BY RANGE_N("event_ts" BETWEEN '
+        f"TIMESTAMP '{online_config.partition_start.isoformat()} 00:00:00' "
+        f"AND TIMESTAMP '{online_config.partition_end.isoformat()} 23:59:59.999999' "
+        f"EACH INTERVAL '1' {online_config.partition_event_ts.upper()}, NO RANGE)"
+    )
+
+
+def _staging_table_name(project: str, table: FeatureView) -> str:
+    return f"{_table_id(project, table)}_t_{uuid.uuid4().hex[:12]}"
+
+
+def _drop_staging_table(conn, staging_table: str):
+    try:
+        conn.execute(f"DROP TABLE {staging_table}")
+    except Exception as e:
+        # The table may not exist if the upload failed before creating it; never mask the original error
+        logger.warning("Could not drop online staging table %s: %s", staging_table, e)
+
+
 def _to_naive_utc(ts: datetime):
     if ts.tzinfo is None:
         return ts
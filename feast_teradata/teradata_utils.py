@@ -1,11 +1,18 @@
+import contextlib
+import itertools
+import threading
+
 from teradataml import (
     create_context,
     get_context
 )
 from feast.repo_config import FeastConfigBaseModel
-from typing import Dict, Optional
-from pydantic import StrictStr
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from pydantic import StrictStr, root_validator
 from feast.value_type import ValueType
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
 
 import pyarrow as pa
 
@@ -18,6 +25,27 @@ class TeradataConfig(FeastConfigBaseModel):
     password: StrictStr
     log_mech: Optional[StrictStr] = "LDAP"
 
+    pool_size: int = 5
+    """ Number of connections kept open in the pool between checkouts """
+
+    pool_max_size: int = 10
+    """ Maximum number of connections checked out of the pool at once """
+
+    pool_timeout_seconds: float = 30
+    """ Seconds to wait for a free connection once pool_max_size connections are checked out """
+
+    pool_pre_ping: bool = True
+    """ Check that a pooled connection is still alive before handing it out """
+
+    pool_recycle_seconds: int = 3600
+    """ Reopen pooled connections older than this many seconds (-1 disables) """
+
+    @root_validator(skip_on_failure=True)
+    def _check_pool_size(cls, values):
+        if values["pool_max_size"] < values["pool_size"]:
+            raise ValueError("pool_max_size must be at least pool_size")
+        return values
+
 
 def teradata_type_to_feast_value_type(data_type):
     type_map: Dict[str, ValueType] = {
@@ -30,7 +58,79 @@ def teradata_type_to_feast_value_type(data_type):
     return type_map[str(data_type)]
 
 
-def get_conn(config: TeradataConfig):
+_engines: Dict[Tuple[str, str], Engine] = {}
+_engines_lock = threading.Lock()
+_checkouts = threading.local()
+
+
+def get_conn(config: TeradataConfig) -> Engine:
+    """
+    Return the connection pool of config. Every distinct config gets its own pool, so the
+    online and the offline store never compete for each other's connections.
+    """
+    key = (type(config).__name__, config.json())
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = create_engine(
+                "teradatasql://",
+                poolclass=QueuePool,
+                connect_args={
+                    "host": config.host,
+                    "dbs_port": str(config.port),
+                    "user": config.user,
+                    "password": config.password,
+                    "database": config.database,
+                    "logmech": config.log_mech,
+                },
+                pool_size=config.pool_size,
+                max_overflow=config.pool_max_size - config.pool_size,
+                pool_timeout=config.pool_timeout_seconds,
+                pool_pre_ping=config.pool_pre_ping,
+                pool_recycle=config.pool_recycle_seconds,
+            )
+            _engines[key] = engine
+        return engine
+
+
+@contextlib.contextmanager
+def pooled_connection(config: TeradataConfig, exclusive: bool = False) -> Iterator:
+    """
+    Check a teradatasql connection out of the pool of config for the duration of the block.
+    Nested checkouts on the same thread reuse the outer connection, so they share its session.
+
+    An exclusive connection is neither shared with nor taken from other checkouts, for blocks that
+    stay open across yields, such as result iterators, where unrelated code may run in between.
+    """
+    engine = get_conn(config)
+    if exclusive:
+        conn = engine.raw_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+        return
+
+    held = getattr(_checkouts, "connections", None)
+    if held is None:
+        held = _checkouts.connections = {}
+    if engine in held:
+        yield held[engine]
+        return
+
+    conn = engine.raw_connection()
+    held[engine] = conn
+    try:
+        yield conn
+    finally:
+        del held[engine]
+        conn.close()
+
+
+def get_teradataml_context(config: TeradataConfig):
+    """
+    teradataml functions such as copy_to_sql run on teradataml's global context, created on first use.
+    """
     if get_context() is None:
         create_context(host=config.host,
                        username=config.user,
@@ -39,3 +139,49 @@ def get_conn(config: TeradataConfig):
                        logmech=config.log_mech)
 
     return get_context()
+
+
+def bulk_insert(
+        conn,
+        cur,
+        table_name: str,
+        column_names: List[str],
+        rows: Iterable[Sequence[Any]],
+        batch_size: int,
+        fastload: bool = False,
+):
+    """
+    Insert rows into table_name with batched parameterized inserts of batch_size rows. With fastload
+    the driver runs all batches as a single FastLoad job (or regular inserts when FastLoad is not
+    possible), which is committed once at the end.
+    """
+    column_list = ", ".join(f'"{name}"' for name in column_names)
+    markers = ", ".join("?" for _ in column_names)
+    insert = f"INSERT INTO {table_name} ({column_list}) VALUES ({markers})"
+    rows = iter(rows)
+    batches = iter(lambda: list(itertools.islice(rows, batch_size)), [])
+
+    if fastload:
+        insert = "{fn teradata_try_fastload}" + insert
+        cur.execute("{fn teradata_nativesql}{fn teradata_autocommit_off}")
+        try:
+            for batch in batches:
+                cur.executemany(insert, batch)
+            _raise_fastload_errors(cur, table_name, insert)
+            conn.commit()
+            _raise_fastload_errors(cur, table_name, insert)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.execute("{fn teradata_nativesql}{fn teradata_autocommit_on}")
+    else:
+        for batch in batches:
+            cur.executemany(insert, batch)
+
+
+def _raise_fastload_errors(cur, table_name: str, insert: str):
+    cur.execute("{fn teradata_nativesql}{fn teradata_get_errors}" + insert)
+    errors = [row[0] for row in cur.fetchall()]
+    if errors:
+        raise RuntimeError(f"FastLoad into {table_name} failed: {errors}")
@@ -24,6 +24,7 @@ setup(
         ],
     },
     install_requires=required,
+    extras_require={'lz4': ['lz4']},
     tests_require=['pytest==6.2.4'],
     license_files=['LICENSE', 'LICENSE-3RD-PARTY.txt'],
     entry_points={'console_scripts': [
@@ -0,0 +1,21 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Usage telemetry would make network calls from every online store call under test
+os.environ.setdefault("FEAST_USAGE", "False")
+
+# The benchmark suite and its in-memory stand-in database double as test fixtures
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+
+@pytest.fixture
+def standin_db():
+    from standin_db import InMemoryTeradata
+
+    db = InMemoryTeradata()
+    db.install()
+    yield db
+    db.uninstall()
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+
+import pytest
+from feast import Entity, FeatureView, Field, FileSource, RepoConfig
+from feast.protos.feast.types.EntityKey_pb2 import EntityKey as EntityKeyProto
+from feast.protos.feast.types.Value_pb2 import Value as ValueProto
+from feast.types import Int64
+
+from feast_teradata.online.cache import OnlineReadCache
+from feast_teradata.online.teradata import TeradataOnlineStore
+
+T0 = datetime(2024, 1, 1)
+
+FEATURE_VIEW = FeatureView(
+    name="driver_stats",
+    entities=[Entity(name="driver", join_keys=["driver_id"])],
+    schema=[Field(name="a", dtype=Int64)],
+    source=FileSource(path="driver_stats.parquet", timestamp_field="event_timestamp"),
+    ttl=timedelta(days=1),
+)
+
+
+def make_config(layout: str) -> RepoConfig:
+    return RepoConfig(
+        project="test",
+        provider="local",
+        registry="registry.db",
+        online_store={
+            "type": "feast_teradata.online.teradata.TeradataOnlineStore",
+            "host": "localhost",
+            "database": "test",
+            "user": "test",
+            "password": "test",
+            "table_layout": layout,
+            "cache_max_size": 100,
+        },
+        entity_key_serialization_version=2,
+    )
+
+
+def write(driver_id: int, event_ts: datetime, a: int):
+    entity_key = EntityKeyProto(join_keys=["driver_id"], entity_values=[ValueProto(int64_val=driver_id)])
+    return entity_key, {"a": ValueProto(int64_val=a)}, event_ts, None
+
+
+@pytest.mark.parametrize("invalidate", [
+    lambda cache: cache.invalidate([("t", b"k", "a")]),
+    lambda cache: cache.invalidate_table("t"),
+    lambda cache: cache.clear(),
+])
+def test_put_is_skipped_after_an_invalidation(invalidate):
+    cache = OnlineReadCache(max_size=10, ttl_seconds=60, cache_missing=True)
+    generation = cache.generation("t")
+
+    invalidate(cache)
+    cache.put(("t", b"k", "a"), (T0, ValueProto(int64_val=1)), generation)
+    cache.put_missing(("t", b"k", "b"), generation)
+
+    assert cache.get(("t", b"k", "a")) is None
+    assert cache.get(("t", b"k", "b")) is None
+
+
+def test_invalidation_leaves_puts_of_other_tables_alone():
+    cache = OnlineReadCache(max_size=10, ttl_seconds=60, cache_missing=True)
+    generation = cache.generation("u")
+
+    cache.invalidate_table("t")
+    cache.put(("u", b"k", "a"), (T0, ValueProto(int64_val=1)), generation)
+
+    assert cache.get(("u", b"k", "a")) is not None
+
+
+@pytest.mark.parametrize("layout", ["narrow", "wide"])
+@pytest.mark.parametrize("read_many", [False, True])
+def test_read_racing_a_write_does_not_cache_the_old_value(standin_db, monkeypatch, layout, read_many):
+    config = make_config(layout)
+    store = TeradataOnlineStore()
+    store.update(config, [], [FEATURE_VIEW], [], [], False)
+    store.online_write_batch(config, FEATURE_VIEW, [write(1, T0, a=1)], None)
+    entity_key = write(1, T0, a=1)[0]
+
+    def read():
+        if read_many:
+            [rows] = store.online_read_many(config, [(FEATURE_VIEW, [entity_key], ["a"])])
+        else:
+            rows = store.online_read(config, FEATURE_VIEW, [entity_key], ["a"])
+        return rows[0][1]["a"].int64_val
+
+    fetch_many = store._fetch_many
+
+    def fetch_then_write(*args, **kwargs):
+        # The write lands after Teradata was read but before the read result is cached
+        fetched = fetch_many(*args, **kwargs)
+        monkeypatch.setattr(store, "_fetch_many", fetch_many)
+        store.online_write_batch(config, FEATURE_VIEW, [write(1, T0 + timedelta(hours=1), a=2)], None)
+        return fetched
+
+    monkeypatch.setattr(store, "_fetch_many", fetch_then_write)
+
+    assert read() == 1
+    assert read() == 2
@@ -0,0 +1,21 @@
+import argparse
+
+import pytest
+
+import online_store_suite
+
+
+@pytest.mark.parametrize("layout", ["narrow", "wide"])
+@pytest.mark.parametrize("write_method", ["copy_to_sql", "executemany", "fastload"])
+def test_online_store_suite_reads_back_written_values(standin_db, layout, write_method):
+    args = argparse.Namespace(backend="memory", layout_name=layout, write_method=write_method)
+    config = online_store_suite.make_config(args)
+
+    # run_case asserts that every read returns the values and event timestamps that were written
+    write_rows_per_second, latencies = online_store_suite.run_case(
+        config, n_entities=200, n_features=4, value_bytes=64, read_keys=10, reads=20
+    )
+
+    assert write_rows_per_second > 0
+    assert len(latencies) == 20
+    assert standin_db.round_trips > 0
@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta
+
+import pytest
+from feast import Entity, FeatureView, Field, FileSource, RepoConfig
+from feast.infra.key_encoding_utils import serialize_entity_key
+from feast.protos.feast.types.EntityKey_pb2 import EntityKey as EntityKeyProto
+from feast.protos.feast.types.Value_pb2 import Value as ValueProto
+from feast.types import Int64
+
+from feast_teradata.online.teradata import TeradataOnlineStore, _to_staging_columns
+
+T0 = datetime(2024, 1, 1)
+
+FEATURE_VIEW = FeatureView(
+    name="driver_stats",
+    entities=[Entity(name="driver", join_keys=["driver_id"])],
+    schema=[Field(name="a", dtype=Int64), Field(name="b", dtype=Int64)],
+    source=FileSource(path="driver_stats.parquet", timestamp_field="event_timestamp"),
+    ttl=timedelta(days=1),
+)
+
+
+def make_config(layout: str) -> RepoConfig:
+    return RepoConfig(
+        project="test",
+        provider="local",
+        registry="registry.db",
+        online_store={
+            "type": "feast_teradata.online.teradata.TeradataOnlineStore",
+            "host": "localhost",
+            "database": "test",
+            "user": "test",
+            "password": "test",
+            "table_layout": layout,
+        },
+        entity_key_serialization_version=2,
+    )
+
+
+def entity_key(driver_id: int) -> EntityKeyProto:
+    return EntityKeyProto(join_keys=["driver_id"], entity_values=[ValueProto(int64_val=driver_id)])
+
+
+def write(driver_id: int, event_ts: datetime, created_ts=None, **values):
+    return entity_key(driver_id), {name: ValueProto(int64_val=v) for name, v in values.items()}, event_ts, created_ts
+
+
+def staged_rows(layout: str, data):
+    """
+    {(driver_id, feature): (value, event_ts, created_ts)} of the staging rows built for data.
+    """
+    config = make_config(layout)
+    columns = _to_staging_columns(config, FEATURE_VIEW, data)
+    driver_ids = {
+        serialize_entity_key(key, entity_key_serialization_version=config.entity_key_serialization_version):
+            key.entity_values[0].int64_val
+        for key, _, _, _ in data
+    }
+    feature_names = columns["feature_name"] if layout == "narrow" else ["a", "b"]
+
+    rows = {}
+    for i, key in enumerate(columns["entity_key"]):
+        for name in ([feature_names[i]] if layout == "narrow" else feature_names):
+            value = columns["value" if layout == "narrow" else name][i]
+            if value is not None:
+                assert (driver_ids[key], name) not in rows, "every key must be staged only once"
+                rows[(driver_ids[key], name)] = (
+                    ValueProto.FromString(value).int64_val, columns["event_ts"][i], columns["created_ts"][i]
+                )
+    return rows
+
+
+@pytest.mark.parametrize("layout", ["narrow", "wide"])
+def test_duplicate_keys_in_a_batch_keep_the_newest_write(layout):
+    data = [
+        write(1, T0 + timedelta(hours=1), a=10, b=11),
+        write(1, T0 + timedelta(hours=2), a=20, b=21),
+        write(1, T0, a=30, b=31),
+        write(2, T0, a=40, b=41),
+    ]
+
+    assert staged_rows(layout, data) == {
+        (1, "a"): (20, T0 + timedelta(hours=2), None),
+        (1, "b"): (21, T0 + timedelta(hours=2), None),
+        (2, "a"): (40, T0, None),
+        (2, "b"): (41, T0, None),
+    }
+
+
+@pytest.mark.parametrize("layout", ["narrow", "wide"])
+def test_created_ts_breaks_event_ts_ties(layout):
+    data = [
+        write(1, T0, T0 + timedelta(minutes=2), a=10, b=11),
+        write(1, T0, T0 + timedelta(minutes=1), a=20, b=21),
+        write(2, T0, None, a=30, b=31),
+        write(2, T0, T0, a=40, b=41),
+    ]
+
+    assert staged_rows(layout, data) == {
+        (1, "a"): (10, T0, T0 + timedelta(minutes=2)),
+        (1, "b"): (11, T0, T0 + timedelta(minutes=2)),
+        (2, "a"): (40, T0, T0),
+        (2, "b"): (41, T0, T0),
+    }
+
+
+@pytest.mark.parametrize("layout", ["narrow", "wide"])
+def test_equally_new_writes_keep_the_first_one(layout):
+    # A stored row is kept against an equally new write, so the batch keeps its first write as well
+    data = [
+        write(1, T0, T0, a=10, b=11),
+        write(1, T0, T0, a=20, b=21),
+    ]
+
+    assert staged_rows(layout, data) == {
+        (1, "a"): (10, T0, T0),
+        (1, "b"): (11, T0, T0),
+    }
+
+
+def test_wide_layout_does_not_fill_missing_features_from_older_writes():
+    data = [
+        write(1, T0 + timedelta(hours=1), a=10),
+        write(1, T0, a=20, b=21),
+        write(2, T0, b=31),
+    ]
+
+    # b of the older write would otherwise be stamped with the newer event_ts and replace stored values
+    assert staged_rows("wide", data) == {
+        (1, "a"): (10, T0 + timedelta(hours=1), None),
+        (2, "b"): (31, T0, None),
+    }
+
+
+@pytest.mark.parametrize("layout", ["narrow", "wide"])
+@pytest.mark.parametrize("write_method", ["copy_to_sql", "executemany"])
+def test_older_writes_in_a_batch_keep_newer_stored_values(standin_db, layout, write_method):
+    config = make_config(layout)
+    config.online_store = config.online_store.copy(update={"write_method": write_method})
+    store = TeradataOnlineStore()
+    store.update(config, [], [FEATURE_VIEW], [], [], False)
+    store.online_write_batch(config, FEATURE_VIEW, [write(1, T0 + timedelta(minutes=30), a=1, b=2)], None)
+
+    store.online_write_batch(
+        config, FEATURE_VIEW, [write(1, T0 + timedelta(hours=1), a=10), write(1, T0, a=20, b=21)], None
+    )
+
+    [(_, values)] = store.online_read(config, FEATURE_VIEW, [entity_key(1)], ["a", "b"])
+    assert {name: value.int64_val for name, value in values.items()} == {"a": 10, "b": 2}
@@ -0,0 +1,249 @@
+"""
+Runs the point-in-time join template against SQLite and compares it with the template it replaced,
+which identified entity rows by a VARCHAR concatenation of their key columns. Feature views have no
+ttl here, since the ttl filter uses Teradata interval syntax.
+"""
+import sqlite3
+
+import pytest
+
+from feast_teradata.offline.teradata import (
+    MULTIPLE_FEATURE_VIEW_POINT_IN_TIME_JOIN,
+    build_point_in_time_query,
+)
+
+# The previous template, which joined on a concatenated VARCHAR row id, kept to compare results with
+LEGACY_POINT_IN_TIME_JOIN = """
+/*
+Compute a deterministic hash for the `left_table_query_string` that will be used throughout
+all the logic as the field to GROUP BY the data
+*/
+WITH "entity_dataframe" AS (
+    SELECT a.*,
+        "{{entity_df_event_timestamp_col}}" AS "entity_timestamp"
+        {% for featureview in featureviews %}
+            {% if featureview.entities %}
+            ,(
+                {% for entity in featureview.entities %}
+                    CAST("{{entity}}" AS VARCHAR(256)) ||
+                {% endfor %}
+                CAST("{{entity_df_event_timestamp_col}}" AS VARCHAR(256))
+            ) AS "{{featureview.name}}__entity_row_unique_id"
+            {% else %}
+            ,CAST("{{entity_df_event_timestamp_col}}" AS VARCHAR(1000)) AS "{{featureview.name}}__entity_row_unique_id"
+            {% endif %}
+        {% endfor %}
+    FROM "{{ left_table_query_string }}" a
+),
+{% for featureview in featureviews %}
+"{{ featureview.name }}__entity_dataframe" AS (
+    SELECT
+       {{ featureview.entities | map('tojson') | join(', ')}}{% if featureview.entities %},{% else %}{% endif %}
+        "entity_timestamp",
+        "{{featureview.name}}__entity_row_unique_id"
+    FROM "entity_dataframe"
+    GROUP BY
+        {{ featureview.entities | map('tojson') | join(', ')}}{% if featureview.entities %},{% else %}{% endif %}
+        "entity_timestamp",
+        "{{featureview.name}}__entity_row_unique_id"
+),
+/*
+This query template performs the point-in-time correctness join for a single feature set table
+to the provided entity table.
+1. We first join the current feature_view to the entity dataframe that has been passed.
+This JOIN has the following logic:
+    - For each row of the entity dataframe, only keep the rows where the `timestamp_field`
+    is less than the one provided in the entity dataframe
+    - If there a TTL for the current feature_view, also keep the rows where the `timestamp_field`
+    is higher the the one provided minus the TTL
+    - For each row, Join on the entity key and retrieve the `entity_row_unique_id` that has been
+    computed previously
+The output of this CTE will contain all the necessary information and already filtered out most
+of the data that is not relevant.
+*/
+"{{ featureview.name }}__subquery" AS (
+    SELECT
+        "{{ featureview.timestamp_field }}" as "event_timestamp",
+        {{'"' ~ featureview.created_timestamp_column ~ '" as "created_timestamp",' if featureview.created_timestamp_column else '' }}
+        {{featureview.entity_selections | join(', ')}}{% if featureview.entity_selections %},{% else %}{% endif %}
+        {% for feature in featureview.features %}
+            "{{ feature }}" as {% if full_feature_names %}"{{ featureview.name }}__{{featureview.field_mapping.get(feature, feature)}}"{% else %}"{{ featureview.field_mapping.get(feature, feature) }}"{% endif %}{% if loop.last %}{% else %}, {% endif %}
+        {% endfor %}
+    FROM {{ featureview.table_subquery }} as base
+    WHERE "{{ featureview.timestamp_field }}" <= '{{ featureview.max_event_timestamp }}'
+    {% if featureview.ttl == 0 %}{% else %}
+    AND "{{ featureview.timestamp_field }}" >= '{{ featureview.min_event_timestamp }}'
+    {% endif %}
+),
+"{{ featureview.name }}__base" AS (
+    SELECT
+        "subquery".*,
+        "entity_dataframe"."entity_timestamp",
+        "entity_dataframe"."{{featureview.name}}__entity_row_unique_id"
+    FROM "{{ featureview.name }}__subquery" AS "subquery"
+    INNER JOIN "{{ featureview.name }}__entity_dataframe" AS "entity_dataframe"
+    ON 1=1
+        AND "subquery"."event_timestamp" <= "entity_dataframe"."entity_timestamp"
+        {% if featureview.ttl == 0 %}{% else %}
+        AND subquery.event_timestamp >= entity_dataframe.entity_timestamp - {{ featureview.ttl }} * interval '0 00:00:01' day to second /* 
+Uses TD specific function day to second to make sure any value for TTL works (up till 27 years converted to seconds). Takes an additional day parameter to convert the value to seconds
+ */
+        {% endif %}
+        {% for entity in featureview.entities %}
+        AND "subquery"."{{ entity }}" = "entity_dataframe"."{{ entity }}"
+        {% endfor %}
+),
+/*
+2. If the `created_timestamp_column` has been set, we need to
+deduplicate the data first. This is done by calculating the
+`MAX(created_at_timestamp)` for each event_timestamp.
+We then join the data on the next CTE
+*/
+{% if featureview.created_timestamp_column %}
+"{{ featureview.name }}__dedup" AS (
+    SELECT
+        "{{featureview.name}}__entity_row_unique_id",
+        "event_timestamp",
+        MAX("created_timestamp") AS "created_timestamp"
+    FROM "{{ featureview.name }}__base"
+    GROUP BY "{{featureview.name}}__entity_row_unique_id", "event_timestamp"
+),
+{% endif %}
+/*
+3. The data has been filtered during the first CTE "*__base"
+Thus we only need to compute the latest timestamp of each feature.
+*/
+"{{ featureview.name }}__latest" AS (
+    SELECT
+        "event_timestamp",
+        {% if featureview.created_timestamp_column %}"created_timestamp",{% endif %}
+        "{{featureview.name}}__entity_row_unique_id"
+    FROM
+    (
+        SELECT b.*,
+            ROW_NUMBER() OVER(
+                PARTITION BY b."{{featureview.name}}__entity_row_unique_id"
+                ORDER BY b."event_timestamp" DESC{% if featureview.created_timestamp_column %},b."created_timestamp" DESC{% endif %}
+            ) AS "row_number"
+        FROM "{{ featureview.name }}__base" b
+        {% if featureview.created_timestamp_column %}
+            INNER JOIN "{{ featureview.name }}__dedup" bb
+            ON b."{{featureview.name}}__entity_row_unique_id" = bb."{{featureview.name}}__entity_row_unique_id"
+            AND b."event_timestamp" = bb."event_timestamp"
+            AND b."created_timestamp" = bb."created_timestamp"
+        {% endif %}
+    ) as c
+    WHERE "row_number" = 1
+),
+/*
+4. Once we know the latest value of each feature for a given timestamp,
+we can join again the data back to the original "base" dataset
+*/
+"{{ featureview.name }}__cleaned" AS (
+    SELECT "base".*
+    FROM "{{ featureview.name }}__base" AS "base"
+    INNER JOIN "{{ featureview.name }}__latest"
+    ON "base"."{{featureview.name}}__entity_row_unique_id" = "{{ featureview.name }}__latest"."{{featureview.name}}__entity_row_unique_id"
+    AND "base"."event_timestamp" = "{{ featureview.name }}__latest"."event_timestamp"
+
+    {% if featureview.created_timestamp_column %}
+        AND
+        "base"."created_timestamp" = "{{ featureview.name }}__latest"."created_timestamp"
+    {% endif %}
+){% if loop.last %}{% else %}, {% endif %}
+{% endfor %}
+/*
+Joins the outputs of multiple time travel joins to a single table.
+The entity_dataframe dataset being our source of truth here.
+*/
+SELECT "{{ final_output_feature_names | join('", "')}}"
+FROM "entity_dataframe"
+{% for featureview in featureviews %}
+LEFT JOIN (
+    SELECT
+        "{{featureview.name}}__entity_row_unique_id"
+        {% for feature in featureview.features %}
+            ,{% if full_feature_names %}"{{ featureview.name }}__{{featureview.field_mapping.get(feature, feature)}}"{% else %}"{{ featureview.field_mapping.get(feature, feature) }}"{% endif %}
+        {% endfor %}
+    FROM "{{ featureview.name }}__cleaned"
+) "{{ featureview.name }}__cleaned" ON "entity_dataframe"."{{featureview.name}}__entity_row_unique_id"="{{ featureview.name }}__cleaned"."{{featureview.name}}__entity_row_unique_id"
+{% endfor %}
+"""
+
+ENTITY_COLUMNS = ["a", "b", "event_timestamp"]
+
+TABLES = """
+CREATE TABLE entity_df (a TEXT, b TEXT, event_timestamp TEXT);
+CREATE TABLE fv_ab_src (a TEXT, b TEXT, ts TEXT, x INT);
+CREATE TABLE fv_a_src (a TEXT, ts TEXT, cts TEXT, y INT);
+CREATE TABLE fv_global_src (ts TEXT, z INT);
+INSERT INTO fv_ab_src VALUES ('1', '23', '2023-01-01', 1), ('1', '23', '2023-01-04', 2), ('12', '3', '2023-01-03', 3);
+INSERT INTO fv_a_src VALUES
+    ('1', '2023-01-01', '2023-01-01', 10), ('1', '2023-01-01', '2023-01-02', 11), ('12', '2023-01-04', '2023-01-04', 12);
+INSERT INTO fv_global_src VALUES ('2023-01-01', 100), ('2023-01-03', 101);
+"""
+
+
+def feature_view_context(name, entities, features, created_timestamp_column=None):
+    return {
+        "name": name,
+        "entities": entities,
+        "features": features,
+        "field_mapping": {},
+        "timestamp_field": "ts",
+        "created_timestamp_column": created_timestamp_column,
+        "entity_selections": [f'"{entity}" AS "{entity}"' for entity in entities],
+        "table_subquery": f'"{name}_src"',
+        "ttl": 0,
+        "min_event_timestamp": "2000-01-01",
+        "max_event_timestamp": "2030-01-01",
+    }
+
+
+FEATURE_VIEWS = [
+    feature_view_context("fv_ab", ["a", "b"], ["x"]),
+    feature_view_context("fv_a", ["a"], ["y"], created_timestamp_column="cts"),
+    feature_view_context("fv_global", [], ["z"]),
+]
+
+
+def run_point_in_time_join(template, entity_rows, full_feature_names):
+    db = sqlite3.connect(":memory:")
+    db.executescript(TABLES)
+    db.executemany("INSERT INTO entity_df VALUES (?, ?, ?)", entity_rows)
+    query = build_point_in_time_query(
+        FEATURE_VIEWS,
+        left_table_query_string="entity_df",
+        entity_df_event_timestamp_col="event_timestamp",
+        entity_df_columns=dict.fromkeys(ENTITY_COLUMNS).keys(),
+        query_template=template,
+        full_feature_names=full_feature_names,
+    )
+    return sorted(db.execute(query).fetchall(), key=str)
+
+
+@pytest.mark.parametrize("full_feature_names", [False, True])
+def test_point_in_time_join_matches_legacy_template(full_feature_names):
+    entity_rows = [("1", "23", "2023-01-05"), ("1", "23", "2023-01-02"), ("9", "9", "2023-01-05")]
+
+    result = run_point_in_time_join(MULTIPLE_FEATURE_VIEW_POINT_IN_TIME_JOIN, entity_rows, full_feature_names)
+
+    assert result == run_point_in_time_join(LEGACY_POINT_IN_TIME_JOIN, entity_rows, full_feature_names)
+    assert result == [
+        ("1", "23", "2023-01-02", 1, 11, 100),
+        ("1", "23", "2023-01-05", 2, 11, 101),
+        ("9", "9", "2023-01-05", None, None, 101),
+    ]
+
+
+def test_point_in_time_join_keeps_colliding_keys_apart():
+    # '1' || '23' and '12' || '3' concatenate to the same legacy row id
+    entity_rows = [("1", "23", "2023-01-05"), ("12", "3", "2023-01-05")]
+
+    result = run_point_in_time_join(MULTIPLE_FEATURE_VIEW_POINT_IN_TIME_JOIN, entity_rows, False)
+
+    assert result == [
+        ("1", "23", "2023-01-05", 2, 11, 101),
+        ("12", "3", "2023-01-05", 3, 12, 101),
+    ]
+    assert run_point_in_time_join(LEGACY_POINT_IN_TIME_JOIN, entity_rows, False) != result